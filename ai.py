@@ -1,9 +1,10 @@
 import os
 import re
 import traceback
+from datetime import date
+from functools import lru_cache
 
-import requests
-from dotenv import load_dotenv
+from metrics import timed_outbound
 
 TAG_RULES = {
     "CKD": ["chronic kidney", "ckd", "eGFR", "albuminuria"],
@@ -16,7 +17,24 @@ TAG_RULES = {
     "Drug / RCT / Guideline": ["randomized", "randomised", "trial", "rct", "guideline"],
 }
 
-load_dotenv()
+
+def load_env():
+    # Same lookup as find_dotenv(), but python-dotenv is only imported when a .env exists.
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+
+            load_dotenv(path)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
+
+
+load_env()
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
@@ -25,6 +43,38 @@ OPENAI_TIMEOUT = int(os.environ.get("OPENAI_TIMEOUT", "20"))
 _TRANSLATION_CACHE = {}
 _ONE_CLICK_SUMMARY_CACHE = {}
 
+IMPACT_POINTS = {"yes": 30, "possibly": 15, "no": 0}
+STUDY_TYPE_POINTS = {
+    "Guideline": 25,
+    "Meta-analysis": 22,
+    "Randomized trial": 20,
+    "Cohort study": 10,
+    "Case-control study": 6,
+    "Cross-sectional study": 5,
+    "Observational study": 4,
+}
+JOURNAL_TIER_POINTS = {
+    "New England Journal of Medicine": 20,
+    "N Engl J Med": 20,
+    "Kidney International": 12,
+    "Journal of the American Society of Nephrology": 12,
+    "Clinical Journal of the American Society of Nephrology": 12,
+    "American Journal of Kidney Diseases": 12,
+    "Nature Reviews Nephrology": 12,
+    "Nephrology Dialysis Transplantation": 8,
+    "Kidney International Reports": 6,
+    "Kidney Int": 12,
+    "J Am Soc Nephrol": 12,
+    "Clin J Am Soc Nephrol": 12,
+    "Am J Kidney Dis": 12,
+    "Nat Rev Nephrol": 12,
+    "Nephrol Dial Transplant": 8,
+    "Kidney Int Rep": 6,
+}
+DEFAULT_JOURNAL_POINTS = 4
+RANK_RECENCY_PER_DAY = 5
+RANK_EPOCH = date(2000, 1, 1)
+
 DESIGN_MAP = {
     "Randomized trial": "RCT",
     "Cohort study": "隊列",
@@ -69,6 +119,19 @@ KNOWN_DRUGS = {
     "tofogliflozin": "tofogliflozin（SGLT2 抑制劑）",
 }
 
+@lru_cache(maxsize=None)
+def _word_pattern(term):
+    return re.compile(rf"\b{re.escape(term)}\b")
+
+
+@lru_cache(maxsize=None)
+def _knockout_patterns(gene_key):
+    return (
+        re.compile(rf"{gene_key}[^.]*\b(ko|knockout|deficient|lacking|deleted)\b"),
+        re.compile(rf"\b(ko|knockout|deficient|lacking|deleted)[^.]*{gene_key}\b"),
+    )
+
+
 def _normalize(text):
     return (text or "").lower()
 
@@ -82,22 +145,25 @@ def openai_chat(messages, temperature=0, model=None, log_errors=True):
         "temperature": temperature,
     }
     try:
-        response = requests.post(
-            OPENAI_API_URL,
-            headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
-            json=payload,
-            timeout=OPENAI_TIMEOUT,
-        )
-        response.raise_for_status()
-        data = response.json()
-        content = (
-            data.get("choices", [{}])[0]
-            .get("message", {})
-            .get("content", "")
-            .strip()
-        )
-        if not content:
-            raise ValueError("empty OpenAI response")
+        import requests
+
+        with timed_outbound("openai", "chat_completions"):
+            response = requests.post(
+                OPENAI_API_URL,
+                headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+                json=payload,
+                timeout=OPENAI_TIMEOUT,
+            )
+            response.raise_for_status()
+            data = response.json()
+            content = (
+                data.get("choices", [{}])[0]
+                .get("message", {})
+                .get("content", "")
+                .strip()
+            )
+            if not content:
+                raise ValueError("empty OpenAI response")
         return {"ok": True, "content": content}
     except Exception as exc:
         if log_errors:
@@ -203,7 +269,7 @@ def _extract_animals(text):
     found = []
     text_norm = _normalize(text)
     for key, label in ANIMAL_MAP.items():
-        if re.search(rf"\b{re.escape(key)}\b", text_norm):
+        if _word_pattern(key).search(text_norm):
             found.append(label)
     return sorted(set(found))
 
@@ -214,9 +280,10 @@ def _extract_gene_knockouts(text):
     for gene_key, gene_label in KNOWN_GENES.items():
         if gene_key not in text_norm:
             continue
-        if re.search(rf"{gene_key}[^.]*\b(ko|knockout|deficient|lacking|deleted)\b", text_norm):
+        after, before = _knockout_patterns(gene_key)
+        if after.search(text_norm):
             hits.add(gene_label)
-        elif re.search(rf"\b(ko|knockout|deficient|lacking|deleted)[^.]*{gene_key}\b", text_norm):
+        elif before.search(text_norm):
             hits.add(gene_label)
     return sorted(hits)
 
@@ -302,7 +369,7 @@ def _extract_location(text):
         "Australia",
     ]
     for location in locations:
-        if re.search(rf"\b{re.escape(location)}\b", text):
+        if _word_pattern(location).search(text):
             return f"地點：{location}"
     return None
 
@@ -783,3 +850,31 @@ def impact_assessment(study_type, outcome_direction):
         "level": "no",
         "reason": "Preliminary evidence or unclear impact.",
     }
+
+
+@lru_cache(maxsize=4096)
+def journal_key(journal):
+    # PubMed titles differ from display names in case, punctuation, a leading "The" and
+    # a trailing " : <society>" subtitle, e.g. "The New England journal of medicine".
+    name = (journal or "").split(" : ")[0].casefold()
+    name = re.sub(r"[^0-9a-z]+", " ", name).strip()
+    if name.startswith("the "):
+        name = name[4:]
+    return name
+
+
+JOURNAL_TIER_KEYS = {journal_key(name): points for name, points in JOURNAL_TIER_POINTS.items()}
+
+
+def rank_score(study_type, impact_level, journal, publish_date):
+    score = (
+        IMPACT_POINTS.get(impact_level, 0)
+        + STUDY_TYPE_POINTS.get(study_type, 0)
+        + JOURNAL_TIER_KEYS.get(journal_key(journal), DEFAULT_JOURNAL_POINTS)
+    )
+    try:
+        published = date.fromisoformat((publish_date or "")[:10])
+    except ValueError:
+        return float(score)
+    # Recency is measured from a fixed epoch, so stored scores never need a daily rescore.
+    return float(score + RANK_RECENCY_PER_DAY * (published - RANK_EPOCH).days)
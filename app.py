@@ -1,15 +1,91 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import argparse
+import base64
+import hashlib
 import json
 import os
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 
-from flask import Flask, jsonify, make_response, render_template, request
+from flask import (
+    Flask,
+    g,
+    jsonify,
+    make_response,
+    render_template,
+    request,
+    send_from_directory,
+    url_for,
+)
 
-from ai import summarize_article_with_openai
-from db import get_article_summary as get_cached_summary, get_db, get_meta, init_db, upsert_article_summary
-from ingest import DEFAULT_JOURNALS, run_ingest, run_ingest_range
+from db import (
+    ALL_TAGS_KEY,
+    BODY_COLUMNS,
+    HOT_COLUMNS,
+    collapse_clause,
+    current_data_version,
+    decompress_text,
+    get_article_summary as get_cached_summary,
+    get_cluster_summary,
+    get_daily_tag_counts,
+    get_db,
+    get_meta,
+    init_db,
+    row_tags,
+    sum_daily_tag_counts,
+    tag_filter,
+    upsert_article_summary,
+)
+import digest
+import export
+import limits
+import metrics
+import profiling
+import related
+import shards
+import writer
+from cache import ResponseCache
+from compress import (
+    STATIC_MAX_AGE,
+    compress_response,
+    etag_variants,
+    precompress_static,
+    precompressed_path,
+    static_mimetype,
+)
+from serialization import FastJSONProvider, dumps
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+
+LIST_COLUMNS = [column for column in HOT_COLUMNS if column not in ("created_at", "updated_at")]
+ARTICLE_FIELDS = [
+    "id",
+    "title",
+    "journal",
+    "publish_date",
+    "url",
+    "tags",
+    "key_takeaway",
+    "study_type",
+    "primary_outcome",
+    "outcome_direction",
+    "pico_p",
+    "pico_i",
+    "pico_c",
+    "pico_o",
+    "impact_level",
+    "impact_reason",
+    "abstract",
+]
+response_cache = ResponseCache()
+STREAM_CHUNK_ROWS = 100
+STARTUP = {}
+BATCH_MAX_IDS = int(os.environ.get("BATCH_MAX_IDS", 500))
+CHANGES_LIMIT = 200
+MAX_CHANGES_LIMIT = 1000
 
 
 def _get_asset_version():
@@ -25,10 +101,112 @@ def _get_asset_version():
     return str(int(max(mtimes))) if mtimes else "1"
 
 
-app.config["ASSET_VERSION"] = os.environ.get("ASSET_VERSION") or _get_asset_version()
+def asset_version():
+    if "ASSET_VERSION" not in app.config:
+        app.config["ASSET_VERSION"] = os.environ.get("ASSET_VERSION") or _get_asset_version()
+    return app.config["ASSET_VERSION"]
+
+
 app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 0
 
 
+@app.context_processor
+def inject_asset_version():
+    return {"asset_version": asset_version()}
+
+
+def _send_precompressed(directory, filename, immutable, etag=None):
+    encoded_name, encoding = precompressed_path(directory, filename, request.accept_encodings)
+    if encoded_name:
+        response = send_from_directory(
+            directory,
+            encoded_name,
+            mimetype=static_mimetype(filename),
+            etag=f"{etag}-{encoding}" if etag else True,
+        )
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = send_from_directory(directory, filename, etag=etag or True)
+    response.vary.add("Accept-Encoding")
+    if immutable:
+        response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+    return response
+
+
+def static_file(filename):
+    versioned = request.args.get("v") == asset_version()
+    return _send_precompressed(app.static_folder, filename, versioned)
+
+
+app.view_functions["static"] = static_file
+
+
+@app.after_request
+def compress_json(response):
+    return compress_response(response, request.accept_encodings)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else None
+    if route and profiling.should_profile_request(route, request.headers):
+        g.profile_capture = profiling.start_capture()
+
+
+@app.teardown_request
+def finish_request_profile(exc):
+    capture = g.pop("profile_capture", None)
+    if capture is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        profiling.finish_capture(capture, f"{request.method}-{route}")
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe_request(
+            route, request.method, response.status_code, time.perf_counter() - started
+        )
+    if "first_response_ms" not in STARTUP:
+        STARTUP["first_response_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+    return response
+
+
+def _cache_gauges():
+    stats = response_cache.stats()
+    yield ("hits",), stats["hits"]
+    yield ("misses",), stats["misses"]
+    yield ("evictions",), stats["evictions"]
+    yield ("size",), stats["size"]
+    yield ("hit_ratio",), stats["hit_rate"]
+
+
+def _writer_gauges():
+    stats = writer.stats()
+    for key in ("jobs", "failed_jobs", "batches", "queue_depth", "wait_seconds_avg"):
+        yield (key,), stats[key]
+
+
+def _limit_gauges():
+    for name, stats in limits.stats().items():
+        for key, value in stats.items():
+            yield (name, key), value
+
+
+metrics.register_gauge(
+    "nephro_response_cache", "Response cache counters and hit ratio.", ("stat",), _cache_gauges
+)
+metrics.register_gauge(
+    "nephro_db_writer", "Database writer queue and batch counters.", ("stat",), _writer_gauges
+)
+metrics.register_gauge(
+    "nephro_admission", "Admission control counters by endpoint.", ("endpoint", "stat"), _limit_gauges
+)
+
+
 def _parse_tags(args):
     values = []
     raw_list = args.getlist("tags")
@@ -46,33 +224,189 @@ def _parse_tags(args):
     return sorted(set(tags))
 
 
-def row_to_dict(row, include_abstract=False):
-    tags = json.loads(row["tags"]) if row["tags"] else []
+def _parse_fields(args):
+    raw = args.get("fields")
+    if not raw:
+        return None
+    requested = {part.strip() for part in raw.split(",") if part.strip()}
+    unknown = requested.difference(ARTICLE_FIELDS)
+    if unknown:
+        raise ValueError(", ".join(sorted(unknown)))
+    requested.add("id")
+    return tuple(field for field in ARTICLE_FIELDS if field in requested)
+
+
+def _encode_sync_token(updated_at, article_id):
+    raw = json.dumps([updated_at, article_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_sync_token(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        updated_at, article_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("invalid sync token")
+    if not isinstance(updated_at, str) or not isinstance(article_id, str):
+        raise ValueError("invalid sync token")
+    return updated_at, article_id
+
+
+def _article_select(include_body, fields=None):
+    if fields is None:
+        hot_columns = LIST_COLUMNS
+        body_columns = BODY_COLUMNS if include_body else []
+    else:
+        wanted = set(fields) | {"id", "publish_date"}
+        if "tags" in wanted:
+            wanted.add("tags_mask")
+        hot_columns = [column for column in LIST_COLUMNS if column in wanted]
+        body_columns = [column for column in BODY_COLUMNS if column in wanted]
+    columns = [f"articles.{column}" for column in hot_columns]
+    source = "articles"
+    if body_columns:
+        columns.extend(f"article_bodies.{column}" for column in body_columns)
+        source += " LEFT JOIN article_bodies ON article_bodies.article_id = articles.id"
+    return f"SELECT {', '.join(columns)} FROM {source}"
+
+
+def row_to_dict(row, include_abstract=False, fields=None):
+    if fields is not None:
+        payload = {}
+        for field in fields:
+            if field == "tags":
+                payload[field] = row_tags(row)
+            elif field in BODY_COLUMNS:
+                payload[field] = decompress_text(row[field])
+            else:
+                payload[field] = row[field]
+        return payload
     payload = {
         "id": row["id"],
         "title": row["title"],
         "journal": row["journal"],
         "publish_date": row["publish_date"],
         "url": row["url"],
-        "tags": tags,
+        "tags": row_tags(row),
         "key_takeaway": row["key_takeaway"],
         "study_type": row["study_type"],
         "primary_outcome": row["primary_outcome"],
         "outcome_direction": row["outcome_direction"],
-        "pico_p": row["pico_p"],
-        "pico_i": row["pico_i"],
-        "pico_c": row["pico_c"],
-        "pico_o": row["pico_o"],
+        "pico_p": None,
+        "pico_i": None,
+        "pico_c": None,
+        "pico_o": None,
         "impact_level": row["impact_level"],
         "impact_reason": row["impact_reason"],
+        "abstract": None,
     }
-    payload["abstract"] = row["abstract"] if include_abstract else None
+    if include_abstract:
+        for column in BODY_COLUMNS:
+            payload[column] = decompress_text(row[column])
     return payload
 
 
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.replace(microsecond=0)
+
+
+def _version_etag(*parts):
+    raw = "|".join(str(part) for part in (*parts, request.full_path))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def _with_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _not_modified(etag, last_modified=None):
+    if request.if_none_match:
+        matched = [
+            candidate
+            for candidate in etag_variants(etag)
+            if request.if_none_match.contains(candidate)
+        ]
+        if not matched:
+            return None
+        etag = matched[0]
+    elif (
+        last_modified is None
+        or request.if_modified_since is None
+        or last_modified > request.if_modified_since
+    ):
+        return None
+    return _with_validators(app.response_class(status=304), etag, last_modified)
+
+
+def _cached_response(key, version, etag, last_modified):
+    body = response_cache.get(key, version)
+    if body is None:
+        return None
+    response = app.response_class(body, mimetype="application/json")
+    return _with_validators(response, etag, last_modified)
+
+
+def _cache_response(key, version, response):
+    response_cache.put(key, version, response.get_data())
+
+
+def _rejected(rejection):
+    status, retry_after = rejection
+    message = "too many requests" if status == 429 else "server busy, try again later"
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = status
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def _stream_items(query, params, to_item, head, tail):
+    # The connection lives entirely inside the body, so an unread body (HEAD, early
+    # disconnect) never leaves one open.
+    def generate():
+        first_row = None
+        yield head
+        conn = get_db()
+        try:
+            cursor = conn.execute(query, params)
+            separator = b""
+            while True:
+                rows = cursor.fetchmany(STREAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                if first_row is None:
+                    first_row = rows[0]
+                yield separator + b",".join(dumps(to_item(row)) for row in rows)
+                separator = b","
+        finally:
+            conn.close()
+        yield tail(first_row)
+
+    return app.response_class(generate(), mimetype="application/json")
+
+
 @app.route("/")
 def index():
-    response = make_response(render_template("index.html"))
+    init_db()
+    name = digest.published_digest()
+    digest_url = url_for("get_digest_file", name=name) if name else ""
+    shard_manifest = shards.manifest_url() or ""
+    if not shard_manifest and shards.SHARD_EXPORT and shards.load_manifest() is not None:
+        shard_manifest = url_for("get_shard_file", filename=shards.MANIFEST_NAME)
+    response = make_response(
+        render_template("index.html", digest_url=digest_url, shard_manifest=shard_manifest)
+    )
     response.headers["Cache-Control"] = "no-store"
     return response
 
@@ -84,19 +418,45 @@ def list_articles():
     start_str = request.args.get("start")
     end_str = request.args.get("end")
     include_abstract = request.args.get("include_abstract", "0") == "1"
+    stream = request.args.get("stream", "0") == "1"
+    collapse = request.args.get("collapse", "0") == "1"
     tags = _parse_tags(request.args)
     limit = int(request.args.get("limit", 200))
     offset = int(request.args.get("offset", 0))
+    try:
+        fields = _parse_fields(request.args)
+    except ValueError as exc:
+        return jsonify({"error": f"unknown fields: {exc}"}), 400
+    version = current_data_version()
+    etag = _version_etag(version["generation"], version["last_sync"])
+    last_modified = _parse_timestamp(version["last_sync"])
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    cache_key = (
+        "articles",
+        selected_date,
+        start_str,
+        end_str,
+        tuple(tags),
+        limit,
+        offset,
+        include_abstract,
+        fields,
+        collapse,
+    )
+    cache_version = (version["generation"], version["last_sync"])
+    cached = _cached_response(cache_key, cache_version, etag, last_modified)
+    if cached is not None:
+        return cached
     conn = get_db()
-    query = "SELECT DISTINCT articles.* FROM articles"
-    join = ""
+    query = _article_select(include_abstract, fields)
     where_clauses = []
     params = []
     if tags:
-        join = " JOIN article_tags ON article_tags.article_id = articles.id"
-        placeholders = ",".join(["?"] * len(tags))
-        where_clauses.append(f"article_tags.tag IN ({placeholders})")
-        params.extend(tags)
+        tag_clause, tag_params = tag_filter(tags)
+        where_clauses.append(tag_clause)
+        params.extend(tag_params)
     if start_str or end_str:
         if not (start_str and end_str):
             conn.close()
@@ -118,37 +478,58 @@ def list_articles():
     elif selected_date:
         where_clauses.append("publish_date = ?")
         params.append(selected_date)
-    if join:
-        query += join
+    if collapse:
+        collapse_sql, collapse_params = collapse_clause(where_clauses, params)
+        where_clauses.append(collapse_sql)
+        params.extend(collapse_params)
     if where_clauses:
         query += " WHERE " + " AND ".join(where_clauses)
     query += " ORDER BY publish_date DESC"
     if limit:
         query += " LIMIT ? OFFSET ?"
         params.extend([limit, offset])
-    rows = conn.execute(query, params).fetchall()
     last_sync = get_meta(conn, "last_sync")
-    conn.close()
-    articles = []
-    for row in rows:
-        article = row_to_dict(row, include_abstract=include_abstract)
-        articles.append(article)
-    if start_str and end_str:
-        effective_date = end_str
-    elif selected_date:
-        effective_date = selected_date
-    elif articles:
-        effective_date = articles[0]["publish_date"]
-    else:
-        effective_date = date.today().isoformat()
-    return jsonify(
-        {
+
+    def to_item(row):
+        return row_to_dict(row, include_abstract=include_abstract, fields=fields)
+
+    def list_meta(first_row):
+        if start_str and end_str:
+            effective_date = end_str
+        elif selected_date:
+            effective_date = selected_date
+        elif first_row:
+            effective_date = first_row["publish_date"]
+        else:
+            effective_date = date.today().isoformat()
+        return {
             "date": effective_date,
             "range": {"start": start_str, "end": end_str} if start_str and end_str else None,
             "last_sync": last_sync,
+        }
+
+    if stream:
+        conn.close()
+        response = _stream_items(
+            query,
+            params,
+            to_item,
+            b'{"articles":[',
+            lambda first_row: b"]," + dumps(list_meta(first_row))[1:],
+        )
+        return _with_validators(response, etag, last_modified)
+    with metrics.timed_query("articles.list"):
+        rows = conn.execute(query, params).fetchall()
+    conn.close()
+    articles = [to_item(row) for row in rows]
+    response = jsonify(
+        {
+            **list_meta(rows[0] if rows else None),
             "articles": articles,
         }
     )
+    _cache_response(cache_key, cache_version, response)
+    return _with_validators(response, etag, last_modified)
 
 
 @app.route("/api/articles/range")
@@ -158,8 +539,14 @@ def list_articles_range():
     end_str = request.args.get("end")
     tags = _parse_tags(request.args)
     include_abstract = request.args.get("include_abstract", "0") == "1"
+    stream = request.args.get("stream", "0") == "1"
+    collapse = request.args.get("collapse", "0") == "1"
     limit = int(request.args.get("limit", 50))
     offset = int(request.args.get("offset", 0))
+    try:
+        fields = _parse_fields(request.args)
+    except ValueError as exc:
+        return jsonify({"error": f"unknown fields: {exc}"}), 400
     if not start_str or not end_str:
         return jsonify({"error": "請提供 start 與 end（YYYY-MM）"}), 400
     try:
@@ -176,50 +563,363 @@ def list_articles_range():
     end_date = next_month - timedelta(days=1)
     start_date = start_month
 
+    version = current_data_version()
+    etag = _version_etag(version["generation"])
+    last_modified = _parse_timestamp(version["last_sync"])
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    cache_key = (
+        "range",
+        start_date.isoformat(),
+        end_date.isoformat(),
+        tuple(tags),
+        limit,
+        offset,
+        include_abstract,
+        fields,
+        collapse,
+    )
+    cache_version = (version["generation"], version["last_sync"])
+    cached = _cached_response(cache_key, cache_version, etag, last_modified)
+    if cached is not None:
+        return cached
     conn = get_db()
     params = [start_date.isoformat(), end_date.isoformat()]
-    join = ""
     where_clauses = ["publish_date BETWEEN ? AND ?"]
     if tags:
-        join = " JOIN article_tags ON article_tags.article_id = articles.id"
-        placeholders = ",".join(["?"] * len(tags))
-        where_clauses.append(f"article_tags.tag IN ({placeholders})")
-        params.extend(tags)
+        tag_clause, tag_params = tag_filter(tags)
+        where_clauses.append(tag_clause)
+        params.extend(tag_params)
+    if collapse:
+        collapse_sql, collapse_params = collapse_clause(where_clauses, params)
+        where_clauses.append(collapse_sql)
+        params.extend(collapse_params)
     where = "WHERE " + " AND ".join(where_clauses)
-    count_query = f"SELECT COUNT(DISTINCT articles.id) FROM articles{join} {where}"
-    total_row = conn.execute(count_query, params).fetchone()
-    total = total_row[0] if total_row else 0
+    if len(tags) <= 1 and not collapse:
+        with metrics.timed_query("articles.range_total_rollup"):
+            total = sum_daily_tag_counts(
+                conn,
+                start_date.isoformat(),
+                end_date.isoformat(),
+                tags[0] if tags else ALL_TAGS_KEY,
+            )
+    else:
+        count_query = f"SELECT COUNT(*) FROM articles {where}"
+        with metrics.timed_query("articles.range_total_count"):
+            total_row = conn.execute(count_query, params).fetchone()
+        total = total_row[0] if total_row else 0
     data_query = (
-        f"SELECT DISTINCT articles.* FROM articles{join} {where} "
+        f"{_article_select(include_abstract, fields)} {where} "
         "ORDER BY publish_date DESC LIMIT ? OFFSET ?"
     )
-    rows = conn.execute(data_query, params + [limit, offset]).fetchall()
+
+    def to_item(row):
+        return row_to_dict(row, include_abstract=include_abstract, fields=fields)
+
+    if stream:
+        conn.close()
+        response = _stream_items(
+            data_query,
+            params + [limit, offset],
+            to_item,
+            b'{"total":%d,"items":[' % total,
+            lambda first_row: b"]}",
+        )
+        return _with_validators(response, etag, last_modified)
+    with metrics.timed_query("articles.range"):
+        rows = conn.execute(data_query, params + [limit, offset]).fetchall()
+    conn.close()
+    items = [to_item(row) for row in rows]
+    response = jsonify({"total": total, "items": items})
+    _cache_response(cache_key, cache_version, response)
+    return _with_validators(response, etag, last_modified)
+
+
+@app.route("/api/articles/facets")
+def article_facets():
+    init_db()
+    start_str = request.args.get("start")
+    end_str = request.args.get("end")
+    if not start_str or not end_str:
+        return jsonify({"error": "start and end required"}), 400
+    try:
+        start_date = export.parse_bound(start_str, is_end=False)
+        end_date = export.parse_bound(end_str, is_end=True)
+    except ValueError:
+        return jsonify({"error": "invalid date range"}), 400
+    if start_date > end_date:
+        return jsonify({"error": "start after end"}), 400
+    if (end_date - start_date).days + 1 > 366:
+        return jsonify({"error": "range too long (max 12 months)"}), 400
+    conn = get_db()
+    with metrics.timed_query("articles.facets"):
+        rows = get_daily_tag_counts(conn, start_date.isoformat(), end_date.isoformat())
+    conn.close()
+    total = 0
+    tag_totals = {}
+    days = {}
+    for row in rows:
+        day = days.setdefault(row["day"], {"date": row["day"], "total": 0, "tags": {}})
+        if row["tag"] == ALL_TAGS_KEY:
+            day["total"] = row["count"]
+            total += row["count"]
+            continue
+        day["tags"][row["tag"]] = row["count"]
+        tag_totals[row["tag"]] = tag_totals.get(row["tag"], 0) + row["count"]
+    return jsonify(
+        {
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "total": total,
+            "tags": tag_totals,
+            "days": list(days.values()),
+        }
+    )
+
+
+@app.route("/api/export")
+def export_articles():
+    init_db()
+    fmt = request.args.get("format", "csv")
+    if fmt not in export.FORMATS:
+        formats = ", ".join(sorted(export.FORMATS))
+        return jsonify({"error": f"format must be one of {formats}"}), 400
+    start_str = request.args.get("start", "")
+    end_str = request.args.get("end", "")
+    try:
+        start = export.parse_bound(start_str, is_end=False) if start_str else None
+        end = export.parse_bound(end_str, is_end=True) if end_str else None
+    except ValueError:
+        return jsonify({"error": "日期格式錯誤，請使用 YYYY-MM-DD 或 YYYY-MM"}), 400
+    compressed = request.args.get("gzip", "0") == "1"
+    query, params = export.selection_query(
+        start,
+        end,
+        _parse_tags(request.args),
+        request.args.get("q", ""),
+        request.args.get("collapse", "0") == "1",
+        request.args.get("abstract", "1") == "1",
+    )
+    filename = export.export_filename(fmt, start, end, compressed)
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            limits.EXPORT_LIMIT.release()
+
+    def generate():
+        conn = get_db()
+        try:
+            chunks = export.export_chunks(conn, fmt, query, params)
+            yield from export.gzip_chunks(chunks) if compressed else chunks
+        finally:
+            conn.close()
+            release()
+
+    rejection = limits.EXPORT_LIMIT.try_acquire(limits.client_address(request))
+    if rejection:
+        return _rejected(rejection)
+    content_type = "application/gzip" if compressed else export.FORMATS[fmt][0]
+    response = app.response_class(generate(), content_type=content_type)
+    # The body may never be iterated (HEAD, early disconnect), so closing frees the slot too.
+    response.call_on_close(release)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@app.route("/api/changes")
+def list_changes():
+    init_db()
+    since = request.args.get("since", "")
+    include_abstract = request.args.get("include_abstract", "0") == "1"
+    limit = max(1, min(int(request.args.get("limit", CHANGES_LIMIT)), MAX_CHANGES_LIMIT))
+    try:
+        fields = _parse_fields(request.args)
+    except ValueError as exc:
+        return jsonify({"error": f"unknown fields: {exc}"}), 400
+    try:
+        cursor = _decode_sync_token(since) if since else ("", "")
+    except ValueError:
+        return jsonify({"error": "invalid since token"}), 400
+    conn = get_db()
+    with metrics.timed_query("articles.changes"):
+        # Row-value keyset so SQLite seeks idx_articles_updated instead of scanning.
+        stamps = conn.execute(
+            """
+            SELECT id, updated_at FROM articles
+            WHERE (updated_at, id) > (?, ?)
+            ORDER BY updated_at, id
+            LIMIT ?
+            """,
+            (*cursor, limit + 1),
+        ).fetchall()
+        more = len(stamps) > limit
+        stamps = stamps[:limit]
+        rows = []
+        if stamps:
+            placeholders = ",".join(["?"] * len(stamps))
+            rows = conn.execute(
+                f"{_article_select(include_abstract, fields)} "
+                f"WHERE articles.id IN ({placeholders})",
+                [row["id"] for row in stamps],
+            ).fetchall()
+    conn.close()
+    found = {
+        row["id"]: row_to_dict(row, include_abstract=include_abstract, fields=fields)
+        for row in rows
+    }
+    items = []
+    for stamp in stamps:
+        item = found[stamp["id"]]
+        item["updated_at"] = stamp["updated_at"]
+        items.append(item)
+    next_token = since
+    if stamps:
+        next_token = _encode_sync_token(stamps[-1]["updated_at"], stamps[-1]["id"])
+    response = jsonify({"items": items, "next": next_token, "more": more})
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/articles/batch", methods=["POST"])
+def get_articles_batch():
+    init_db()
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "body must be a JSON object"}), 400
+    ids = payload.get("ids")
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "ids must be a non-empty list"}), 400
+    ids = list(dict.fromkeys(str(article_id) for article_id in ids))
+    if len(ids) > BATCH_MAX_IDS:
+        return jsonify({"error": f"at most {BATCH_MAX_IDS} ids per request"}), 400
+    fields = payload.get("fields")
+    if isinstance(fields, list) and all(isinstance(field, str) for field in fields):
+        fields = ",".join(fields)
+    elif fields is not None and not isinstance(fields, str):
+        return jsonify({"error": "fields must be a string or a list of strings"}), 400
+    try:
+        fields = _parse_fields({"fields": fields} if fields else {})
+    except ValueError as exc:
+        return jsonify({"error": f"unknown fields: {exc}"}), 400
+    placeholders = ",".join(["?"] * len(ids))
+    conn = get_db()
+    with metrics.timed_query("articles.batch"):
+        rows = conn.execute(
+            f"{_article_select(True, fields)} WHERE articles.id IN ({placeholders})", ids
+        ).fetchall()
     conn.close()
-    items = [row_to_dict(row, include_abstract=include_abstract) for row in rows]
-    return jsonify({"total": total, "items": items})
+    found = {
+        row["id"]: row_to_dict(row, include_abstract=True, fields=fields) for row in rows
+    }
+    return jsonify(
+        {
+            "articles": [found[article_id] for article_id in ids if article_id in found],
+            "missing": [article_id for article_id in ids if article_id not in found],
+        }
+    )
 
 
 @app.route("/api/articles/<article_id>")
 def get_article(article_id):
     init_db()
+    try:
+        fields = _parse_fields(request.args)
+    except ValueError as exc:
+        return jsonify({"error": f"unknown fields: {exc}"}), 400
     conn = get_db()
-    row = conn.execute("SELECT * FROM articles WHERE id = ?", (article_id,)).fetchone()
+    stamp = conn.execute(
+        "SELECT updated_at FROM articles WHERE id = ?", (article_id,)
+    ).fetchone()
+    if stamp is None:
+        conn.close()
+        return jsonify({"error": "Not found"}), 404
+    etag = _version_etag(stamp["updated_at"])
+    last_modified = _parse_timestamp(stamp["updated_at"])
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified is not None:
+        conn.close()
+        return not_modified
+    with metrics.timed_query("articles.detail"):
+        row = conn.execute(
+            f"{_article_select(True, fields)} WHERE articles.id = ?", (article_id,)
+        ).fetchone()
     conn.close()
     if row is None:
         return jsonify({"error": "Not found"}), 404
-    article = row_to_dict(row, include_abstract=True)
-    return jsonify(article)
+    article = row_to_dict(row, include_abstract=True, fields=fields)
+    return _with_validators(jsonify(article), etag, last_modified)
+
+
+@app.route("/api/articles/<article_id>/related")
+def get_related_articles(article_id):
+    init_db()
+    limit = min(int(request.args.get("limit", related.RELATED_LIMIT)), related.MAX_RELATED_LIMIT)
+    try:
+        fields = _parse_fields(request.args)
+    except ValueError as exc:
+        return jsonify({"error": f"unknown fields: {exc}"}), 400
+    version = current_data_version()
+    etag = _version_etag(version["generation"])
+    last_modified = _parse_timestamp(version["last_sync"])
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    cache_key = ("related", article_id, limit, fields)
+    cache_version = (version["generation"], version["last_sync"])
+    cached = _cached_response(cache_key, cache_version, etag, last_modified)
+    if cached is not None:
+        return cached
+    conn = get_db()
+    if conn.execute("SELECT 1 FROM articles WHERE id = ?", (article_id,)).fetchone() is None:
+        conn.close()
+        return jsonify({"error": "Not found"}), 404
+    with metrics.timed_query("articles.related"):
+        scores = dict(related.related_articles(conn, article_id, limit))
+    rows = []
+    if scores:
+        placeholders = ",".join(["?"] * len(scores))
+        rows = conn.execute(
+            f"{_article_select(False, fields)} WHERE articles.id IN ({placeholders})",
+            list(scores),
+        ).fetchall()
+    conn.close()
+    items = []
+    for row in sorted(rows, key=lambda row: (-scores[row["id"]], row["id"])):
+        item = row_to_dict(row, include_abstract=False, fields=fields)
+        item["score"] = scores[row["id"]]
+        items.append(item)
+    response = jsonify({"id": article_id, "items": items})
+    _cache_response(cache_key, cache_version, response)
+    return _with_validators(response, etag, last_modified)
 
 
 @app.route("/api/articles/<article_id>/summary", methods=["POST"])
 def get_article_summary(article_id):
     init_db()
     conn = get_db()
-    row = conn.execute("SELECT * FROM articles WHERE id = ?", (article_id,)).fetchone()
+    row = conn.execute(
+        """
+        SELECT articles.title, article_bodies.abstract
+        FROM articles
+        LEFT JOIN article_bodies ON article_bodies.article_id = articles.id
+        WHERE articles.id = ?
+        """,
+        (article_id,),
+    ).fetchone()
     if row is None:
         conn.close()
         return jsonify({"error": "Not found"}), 404
     cached = get_cached_summary(conn, article_id)
+    if not cached:
+        cached = get_cluster_summary(conn, article_id)
+        if cached:
+            writer.submit(
+                upsert_article_summary, article_id, cached, datetime.utcnow().isoformat()
+            )
     if cached:
         try:
             payload = json.loads(cached)
@@ -231,22 +931,92 @@ def get_article_summary(article_id):
             return jsonify(payload), status
         conn.close()
         return jsonify({"ok": False, "summary": "UNKNOWN", "error": "invalid cached summary"}), 500
-    summary = summarize_article_with_openai(row["title"], row["abstract"] or "")
-    if not summary.get("ok"):
-        conn.close()
-        return jsonify(summary), 500
-    upsert_article_summary(
-        conn,
-        article_id,
-        json.dumps(summary, ensure_ascii=False),
-        datetime.utcnow().isoformat(),
-    )
     conn.close()
+    rejection = limits.SUMMARY_LIMIT.try_acquire(limits.client_address(request))
+    if rejection:
+        return _rejected(rejection)
+    try:
+        from ai import summarize_article_with_openai
+
+        summary = summarize_article_with_openai(
+            row["title"], decompress_text(row["abstract"]) or ""
+        )
+        if not summary.get("ok"):
+            return jsonify(summary), 500
+        writer.call(
+            upsert_article_summary,
+            article_id,
+            json.dumps(summary, ensure_ascii=False),
+            datetime.utcnow().isoformat(),
+        )
+    finally:
+        limits.SUMMARY_LIMIT.release()
     return jsonify(summary)
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _digest_hash(name):
+    return name.rsplit("-", 1)[-1].split(".", 1)[0]
+
+
+@app.route("/api/digest")
+def get_digest():
+    init_db()
+    name = digest.current_digest()
+    response = _send_precompressed(digest.digest_dir(), name, False, _digest_hash(name))
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/digest/<name>")
+def get_digest_file(name):
+    if not (name.startswith("digest-") and name.endswith(".json")):
+        return jsonify({"error": "not found"}), 404
+    return _send_precompressed(digest.digest_dir(), name, True, _digest_hash(name))
+
+
+@app.route("/shards/<path:filename>")
+def get_shard_file(filename):
+    if not (shards.SHARD_EXPORT and filename.endswith(".json")):
+        return jsonify({"error": "not found"}), 404
+    immutable = filename != shards.MANIFEST_NAME
+    response = _send_precompressed(shards.shard_dir(), filename, immutable)
+    if not immutable:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/stats")
+def stats():
+    return jsonify(
+        {
+            "writer": writer.stats(),
+            "cache": response_cache.stats(),
+            "limits": limits.stats(),
+            "startup": STARTUP,
+        }
+    )
+
+
 @app.route("/api/refresh", methods=["POST"])
 def refresh_articles():
+    rejection = limits.REFRESH_LIMIT.try_acquire(limits.client_address(request))
+    if rejection:
+        return _rejected(rejection)
+    try:
+        return _refresh_articles()
+    finally:
+        limits.REFRESH_LIMIT.release()
+
+
+def _refresh_articles():
+    # ingest pulls in requests and ElementTree; keep them off the startup path.
+    from ingest import DEFAULT_JOURNALS, run_ingest, run_ingest_range
+
     date_str = request.args.get("date")
     start_str = request.args.get("start")
     end_str = request.args.get("end")
@@ -295,8 +1065,20 @@ def refresh_articles():
     return jsonify({"stored": stored, "last_sync": last_sync})
 
 
+STARTUP["import_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+
+
+def print_startup_report():
+    print(f"[startup] app import {STARTUP['import_ms']} ms, init_db {STARTUP['init_db_ms']} ms")
+    for name, ms in profiling.import_breakdown("app"):
+        print(f"[startup]   {name:<24} {ms:8.1f} ms")
+
+
 if __name__ == "__main__":
+    started = time.perf_counter()
     init_db()
+    STARTUP["init_db_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    precompress_static(app.static_folder)
     parser = argparse.ArgumentParser(description="Run Nephro Brain API server.")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind.")
     parser.add_argument(
@@ -305,5 +1087,10 @@ if __name__ == "__main__":
         default=int(os.environ.get("PORT", 5000)),
         help="Port to listen on (defaults to $PORT or 5000).",
     )
+    parser.add_argument(
+        "--debug", action="store_true", help="Debug mode, with an import-time breakdown."
+    )
     args = parser.parse_args()
-    app.run(host=args.host, port=args.port, debug=False)
+    if args.debug and not os.environ.get("WERKZEUG_RUN_MAIN"):
+        print_startup_report()
+    app.run(host=args.host, port=args.port, debug=args.debug)
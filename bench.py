@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+import tracemalloc
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+
+import ai
+import dedupe
+import related
+from db import SEED_DB_PATH, decompress_text
+from ingest import parse_article, parse_pub_date
+from synthetic import abstract_text, article_xml, iter_articles
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+SCALING_FACTORS = [1, 2, 4, 8, 16]
+RULE_TABLES = ["TAG_RULES", "DESIGN_MAP", "ANIMAL_MAP", "KNOWN_GENES", "KNOWN_DRUGS"]
+
+
+def _article_xml(pmid, title, abstract, journal, publish_date):
+    year, month, day = (publish_date or "2024-01-01").split("-")
+    paragraphs = "".join(
+        f"<AbstractText>{escape(part)}</AbstractText>" for part in abstract.split("\n\n") if part
+    )
+    return (
+        "<PubmedArticle><MedlineCitation>"
+        f"<PMID>{pmid}</PMID><Article><Journal><JournalIssue><PubDate>"
+        f"<Year>{year}</Year><Month>{month}</Month><Day>{day}</Day>"
+        f"</PubDate></JournalIssue><Title>{escape(journal or '')}</Title></Journal>"
+        f"<ArticleTitle>{escape(title)}</ArticleTitle>"
+        f"<Abstract>{paragraphs}</Abstract>"
+        "</Article></MedlineCitation></PubmedArticle>"
+    )
+
+
+def load_corpus(seed_path=SEED_DB_PATH, synthetic=200):
+    corpus = []
+    conn = sqlite3.connect(seed_path)
+    conn.row_factory = sqlite3.Row
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(articles)")}
+    if "abstract" in columns:
+        query = "SELECT id, title, abstract, journal, publish_date FROM articles"
+    else:
+        query = (
+            "SELECT articles.id, title, article_bodies.abstract, journal, publish_date "
+            "FROM articles JOIN article_bodies ON article_bodies.article_id = articles.id"
+        )
+    for row in conn.execute(query):
+        abstract = decompress_text(row["abstract"]) or ""
+        xml = _article_xml(row["id"], row["title"], abstract, row["journal"], row["publish_date"])
+        corpus.append({"title": row["title"], "abstract": abstract, "xml": xml})
+    conn.close()
+    for article in iter_articles(synthetic):
+        corpus.append(
+            {"title": article["title"], "abstract": abstract_text(article), "xml": article_xml(article)}
+        )
+    for item in corpus:
+        item["node"] = ET.fromstring(item["xml"])
+        item["tags"] = ai.infer_tags(item["title"], item["abstract"])
+        item["primary_outcome"] = ai.extract_primary_outcome(item["abstract"])
+    return corpus
+
+
+def _cases():
+    return {
+        "infer_tags": lambda item: ai.infer_tags(item["title"], item["abstract"]),
+        "summarize": lambda item: ai.summarize(item["title"], item["abstract"], item["tags"]),
+        "pico_from_text": lambda item: ai.pico_from_text(
+            item["title"], item["abstract"], item["tags"], item["primary_outcome"]
+        ),
+        "minhash": lambda item: dedupe.signature(item["title"], item["abstract"]),
+        "term_counts": lambda item: related.term_counts(item["title"], item["abstract"]),
+        "xml_fromstring": lambda item: ET.fromstring(item["xml"]),
+        "parse_article": lambda item: parse_article(item["node"]),
+        "parse_pub_date": lambda item: parse_pub_date(item["node"]),
+    }
+
+
+def time_per_article(fn, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in corpus:
+            fn(item)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(corpus) * 1e6
+
+
+def peak_bytes_per_article(fn, corpus):
+    tracemalloc.start()
+    total = 0
+    try:
+        for item in corpus:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn(item)
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+    finally:
+        tracemalloc.stop()
+    return total / len(corpus)
+
+
+def scaling_curve(fn, item, repeat):
+    curve = []
+    for factor in SCALING_FACTORS:
+        abstract = " ".join([item["abstract"]] * factor)
+        scaled = {**item, "abstract": abstract}
+        curve.append(
+            {"chars": len(abstract), "us": round(time_per_article(fn, [scaled], repeat), 2)}
+        )
+    return curve
+
+
+def rules_fingerprint():
+    payload = json.dumps(
+        {name: getattr(ai, name) for name in RULE_TABLES}, sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def run(corpus, repeat, only=None):
+    results = {}
+    cases = _cases()
+    longest = max(corpus, key=lambda item: len(item["abstract"]))
+    for name, fn in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = {
+            "us_per_article": round(time_per_article(fn, corpus, repeat), 2),
+            "peak_bytes_per_article": round(peak_bytes_per_article(fn, corpus)),
+        }
+        if name in ("infer_tags", "summarize", "pico_from_text"):
+            results[name]["scaling"] = scaling_curve(fn, longest, max(1, repeat // 2))
+    return {
+        "articles": len(corpus),
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "rules": rules_fingerprint(),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    regressions = []
+    if baseline.get("rules") != current["rules"]:
+        print(f"Rule tables changed since baseline ({baseline.get('rules')} -> {current['rules']})")
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for key in ("us_per_article", "peak_bytes_per_article"):
+            if not base[key]:
+                continue
+            change = (stats[key] - base[key]) / base[key]
+            flag = "REGRESSION" if change > threshold else ""
+            print(
+                f"{name:<16} {key:<24} {base[key]:>12} -> {stats[key]:>12} {change:+7.1%} {flag}"
+            )
+            if flag:
+                regressions.append((name, key, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest heuristics and parsing.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds (best is kept).")
+    parser.add_argument("--synthetic", type=int, default=200, help="Synthetic articles to add.")
+    parser.add_argument("--only", default="", help="Comma-separated benchmark names.")
+    parser.add_argument("--output", default="", help="Write results JSON here.")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help=f"Store results in {BASELINE_PATH}."
+    )
+    parser.add_argument(
+        "--compare", nargs="?", const=BASELINE_PATH, default="", help="Baseline to compare with."
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.15, help="Relative slowdown flagged as regression."
+    )
+    args = parser.parse_args()
+    corpus = load_corpus(synthetic=args.synthetic)
+    only = {name.strip() for name in args.only.split(",") if name.strip()}
+    current = run(corpus, args.repeat, only)
+    for name, stats in current["results"].items():
+        line = (
+            f"{name:<16} {stats['us_per_article']:>10} us/article "
+            f"{stats['peak_bytes_per_article']:>9} B peak"
+        )
+        if "scaling" in stats:
+            points = " ".join(f"{point['chars']}:{point['us']}" for point in stats["scaling"])
+            line += f"  scaling (chars:us) {points}"
+        print(line)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2)
+        print(f"Saved baseline to {BASELINE_PATH}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            regressions = compare(json.load(handle), current, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
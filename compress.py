@@ -0,0 +1,124 @@
+import argparse
+import gzip
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_MIMETYPES = {"application/json"}
+STATIC_EXTENSIONS = (".js", ".css", ".html", ".svg", ".json", ".txt")
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def available_encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encodings, encodings=None):
+    for encoding in encodings or available_encodings():
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress_bytes(data, encoding, static=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if static else 5)
+    return gzip.compress(data, compresslevel=9 if static else 6, mtime=0)
+
+
+def etag_variants(etag):
+    return [etag] + [f"{etag}-{encoding}" for encoding in available_encodings()]
+
+
+def compress_response(response, accept_encodings):
+    if response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress_bytes(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def precompress_static(static_dir):
+    written = 0
+    for root, _, names in os.walk(static_dir):
+        for name in names:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            mtime = os.path.getmtime(path)
+            data = None
+            for encoding in available_encodings():
+                target = path + (".br" if encoding == "br" else ".gz")
+                if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    continue
+                if data is None:
+                    with open(path, "rb") as handle:
+                        data = handle.read()
+                tmp_path = f"{target}.tmp"
+                with open(tmp_path, "wb") as handle:
+                    handle.write(compress_bytes(data, encoding, static=True))
+                os.replace(tmp_path, target)
+                written += 1
+    return written
+
+
+def precompressed_path(static_dir, filename, accept_encodings):
+    path = os.path.join(static_dir, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None, None
+    candidates = []
+    for encoding in available_encodings():
+        target = path + (".br" if encoding == "br" else ".gz")
+        try:
+            if os.path.getmtime(target) >= mtime:
+                candidates.append(encoding)
+        except OSError:
+            continue
+    encoding = choose_encoding(accept_encodings, candidates) if candidates else None
+    if encoding is None:
+        return None, None
+    return filename + (".br" if encoding == "br" else ".gz"), encoding
+
+
+def static_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompress static assets.")
+    parser.add_argument(
+        "--static-dir",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"),
+        help="Directory to precompress (defaults to ./static).",
+    )
+    args = parser.parse_args()
+    written = precompress_static(args.static_dir)
+    print(f"Wrote {written} compressed files ({', '.join(available_encodings())})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,130 @@
+import argparse
+import hashlib
 import json
 import os
 import sqlite3
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "db.sqlite3")
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from ai import (
+    DEFAULT_JOURNAL_POINTS,
+    IMPACT_POINTS,
+    JOURNAL_TIER_KEYS,
+    RANK_EPOCH,
+    RANK_RECENCY_PER_DAY,
+    STUDY_TYPE_POINTS,
+    TAG_RULES,
+    rank_score,
+)
+
+DB_PATH = os.environ.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "db.sqlite3")
 SEED_DB_PATH = os.path.join(os.path.dirname(__file__), "seed_db.sqlite3")
 SEED_LIMIT = int(os.environ.get("SEED_LIMIT", 20))
+DB_BUSY_TIMEOUT = float(os.environ.get("DB_BUSY_TIMEOUT", 30))
+ALL_TAGS_KEY = "ALL"
+TAG_VOCABULARY = list(TAG_RULES)
+TAG_BITS = {tag: 1 << index for index, tag in enumerate(TAG_VOCABULARY)}
+VOCABULARY_MASK = (1 << len(TAG_VOCABULARY)) - 1
+CUSTOM_TAGS_BIT = 1 << 30
+TAG_MASK_LOOKUP = [
+    tuple(tag for tag in TAG_VOCABULARY if mask & TAG_BITS[tag])
+    for mask in range(VOCABULARY_MASK + 1)
+]
+HOT_COLUMNS = [
+    "id",
+    "title",
+    "journal",
+    "publish_date",
+    "url",
+    "tags",
+    "tags_mask",
+    "key_takeaway",
+    "study_type",
+    "primary_outcome",
+    "outcome_direction",
+    "impact_level",
+    "impact_reason",
+    "created_at",
+    "updated_at",
+]
+BODY_COLUMNS = ["abstract", "pico_p", "pico_i", "pico_c", "pico_o"]
+
+
+_initialized_path = None
+_version_cache = {}
 
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row
     return conn
 
 
-def init_db():
+@contextmanager
+def write_lock():
+    if fcntl is None:
+        yield
+        return
+    with open(f"{DB_PATH}.lock", "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def init_db(seed=True):
+    global _initialized_path
+    if _initialized_path == DB_PATH:
+        return
+    with write_lock():
+        seeded = _init_schema(seed)
+    if seeded:
+        conn = get_db()
+        index_articles(conn)
+        conn.close()
+    _initialized_path = DB_PATH
+
+
+def _init_schema(seed=True):
     conn = get_db()
+    conn.execute("PRAGMA journal_mode=WAL")
     cur = conn.cursor()
+    cur.execute(_articles_table_sql("articles"))
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS articles (
-            id TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            abstract TEXT,
-            journal TEXT,
-            publish_date TEXT,
-            url TEXT,
-            tags TEXT,
-            key_takeaway TEXT,
-            study_type TEXT,
-            primary_outcome TEXT,
-            outcome_direction TEXT,
-            pico_p TEXT,
-            pico_i TEXT,
-            pico_c TEXT,
-            pico_o TEXT,
-            impact_level TEXT,
-            impact_reason TEXT,
-            created_at TEXT,
-            updated_at TEXT
+        CREATE TABLE IF NOT EXISTS article_bodies (
+            article_id TEXT PRIMARY KEY,
+            abstract BLOB,
+            pico_p BLOB,
+            pico_i BLOB,
+            pico_c BLOB,
+            pico_o BLOB
         )
         """
     )
+    _ensure_column(conn, "articles", "tags_mask", "INTEGER NOT NULL DEFAULT 0")
+    _migrate_body_split(conn)
+    _ensure_column(conn, "articles", "rank_score", "REAL")
+    _ensure_column(conn, "articles", "cluster_id", "TEXT")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_articles_publish_date ON articles(publish_date)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_articles_rank ON articles(publish_date, rank_score)"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_articles_cluster ON articles(cluster_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_articles_updated ON articles(updated_at, id)")
+    # The changes feed pages by (updated_at, id); rows from old snapshots may lack a stamp.
+    cur.execute(
+        "UPDATE articles SET updated_at = COALESCE(created_at, '') WHERE updated_at IS NULL"
+    )
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS article_tags (
@@ -73,10 +157,187 @@ def init_db():
         )
         """
     )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS article_minhash (
+            article_id TEXT PRIMARY KEY,
+            signature BLOB NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS article_lsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            article_id TEXT NOT NULL,
+            PRIMARY KEY(band, bucket, article_id)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_article_lsh_article ON article_lsh(article_id)")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS term_postings (
+            term TEXT NOT NULL,
+            article_id TEXT NOT NULL,
+            tf INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            PRIMARY KEY(term, article_id)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_term_postings_article ON term_postings(article_id)"
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS term_df (
+            term TEXT PRIMARY KEY,
+            df INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_tag_counts (
+            day TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(day, tag)
+        ) WITHOUT ROWID
+        """
+    )
     conn.commit()
-    _seed_if_empty(conn)
+    seeded = _seed_if_empty(conn) if seed else 0
     _migrate_article_tags(conn)
+    _migrate_tags_mask(conn)
+    _migrate_rank_scores(conn)
+    if not get_meta(conn, "daily_tag_counts_built"):
+        rebuild_daily_tag_counts(conn)
+        conn.commit()
+    publish_data_version(conn)
     conn.close()
+    return seeded
+
+
+def _articles_table_sql(table):
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            journal TEXT,
+            publish_date TEXT,
+            url TEXT,
+            tags TEXT,
+            tags_mask INTEGER NOT NULL DEFAULT 0,
+            key_takeaway TEXT,
+            study_type TEXT,
+            primary_outcome TEXT,
+            outcome_direction TEXT,
+            impact_level TEXT,
+            impact_reason TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            rank_score REAL,
+            cluster_id TEXT
+        )
+        """
+
+
+def _ensure_column(conn, table, column, definition):
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        conn.commit()
+
+
+def compress_text(text):
+    if text is None:
+        return None
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress_text(blob):
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        return blob
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def upsert_article_body(conn, article_id, body):
+    conn.execute(
+        """
+        INSERT INTO article_bodies (article_id, abstract, pico_p, pico_i, pico_c, pico_o)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(article_id) DO UPDATE SET
+            abstract = excluded.abstract,
+            pico_p = excluded.pico_p,
+            pico_i = excluded.pico_i,
+            pico_c = excluded.pico_c,
+            pico_o = excluded.pico_o
+        WHERE (abstract, pico_p, pico_i, pico_c, pico_o) IS NOT
+            (excluded.abstract, excluded.pico_p, excluded.pico_i, excluded.pico_c, excluded.pico_o)
+        """,
+        (article_id, *[compress_text(body.get(column)) for column in BODY_COLUMNS]),
+    )
+
+
+def tags_to_mask(tags):
+    mask = 0
+    for tag in tags or []:
+        mask |= TAG_BITS.get(tag, CUSTOM_TAGS_BIT)
+    return mask
+
+
+def mask_to_tags(mask):
+    return list(TAG_MASK_LOOKUP[(mask or 0) & VOCABULARY_MASK])
+
+
+def custom_tags(tags):
+    return [tag for tag in tags or [] if tag not in TAG_BITS]
+
+
+def row_tags(row):
+    if row["tags_mask"] & CUSTOM_TAGS_BIT:
+        return json.loads(row["tags"]) if row["tags"] else []
+    return mask_to_tags(row["tags_mask"])
+
+
+def tag_filter(tags):
+    mask = 0
+    custom = []
+    for tag in tags:
+        if tag in TAG_BITS:
+            mask |= TAG_BITS[tag]
+        else:
+            custom.append(tag)
+    clauses = []
+    params = []
+    if mask:
+        clauses.append("articles.tags_mask & ?")
+        params.append(mask)
+    if custom:
+        placeholders = ",".join(["?"] * len(custom))
+        clauses.append(
+            "articles.id IN (SELECT article_id FROM article_tags "
+            f"WHERE tag IN ({placeholders}))"
+        )
+        params.extend(custom)
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def collapse_clause(where_clauses, params):
+    # Keep only the best-ranked article of each near-duplicate cluster among the matches.
+    inner_where = f" WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    return (
+        "articles.id IN (SELECT id FROM ("
+        "SELECT id, ROW_NUMBER() OVER ("
+        "PARTITION BY COALESCE(cluster_id, id) ORDER BY rank_score DESC, id"
+        f") AS cluster_rank FROM articles{inner_where}"
+        ") WHERE cluster_rank = 1)"
+    ), list(params)
 
 
 def get_meta(conn, key):
@@ -93,7 +354,80 @@ def set_meta(conn, key, value):
         """,
         (key, value),
     )
-    conn.commit()
+
+
+def add_meta_counter(conn, key, delta):
+    if not delta:
+        return
+    conn.execute(
+        """
+        INSERT INTO meta (key, value)
+        VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value
+        """,
+        (key, str(delta)),
+    )
+
+
+def bump_generation(conn):
+    conn.execute(
+        """
+        INSERT INTO meta (key, value)
+        VALUES ('generation', '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """
+    )
+
+
+def get_data_version(conn):
+    return {
+        "generation": int(get_meta(conn, "generation") or 0),
+        "last_sync": get_meta(conn, "last_sync"),
+        "digest": get_meta(conn, "digest"),
+        "digest_generation": int(get_meta(conn, "digest_generation") or 0),
+    }
+
+
+def publish_data_version(conn):
+    # Callers hold write_lock, so the file follows commit order across processes and the
+    # comparison below is against what other processes last published, not a local cache.
+    version = get_data_version(conn)
+    path = f"{DB_PATH}.version"
+    try:
+        with open(path) as handle:
+            if json.load(handle) == version:
+                return version
+    except (OSError, ValueError):
+        pass
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as handle:
+        json.dump(version, handle)
+    os.replace(tmp_path, path)
+    return version
+
+
+def current_data_version():
+    path = f"{DB_PATH}.version"
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        conn = get_db()
+        version = get_data_version(conn)
+        conn.close()
+        return version
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if _version_cache.get("key") == key:
+        return _version_cache["value"]
+    try:
+        with open(path) as handle:
+            version = json.load(handle)
+    except (OSError, ValueError):
+        conn = get_db()
+        version = get_data_version(conn)
+        conn.close()
+        return version
+    _version_cache.update({"key": key, "value": version})
+    return version
 
 
 def get_article_summary(conn, article_id):
@@ -104,6 +438,21 @@ def get_article_summary(conn, article_id):
     return row["summary_json"] if row else None
 
 
+def get_cluster_summary(conn, article_id):
+    row = conn.execute(
+        """
+        SELECT article_summaries.summary_json
+        FROM articles AS article
+        JOIN articles AS sibling ON sibling.cluster_id = article.cluster_id
+        JOIN article_summaries ON article_summaries.article_id = sibling.id
+        WHERE article.id = ? AND article.cluster_id IS NOT NULL AND sibling.id != article.id
+        LIMIT 1
+        """,
+        (article_id,),
+    ).fetchone()
+    return row["summary_json"] if row else None
+
+
 def upsert_article_summary(conn, article_id, summary_json, updated_at):
     conn.execute(
         """
@@ -115,10 +464,15 @@ def upsert_article_summary(conn, article_id, summary_json, updated_at):
         """,
         (article_id, summary_json, updated_at),
     )
-    conn.commit()
+    # Stamped here, under the write lock, so the changes feed sees stamps in commit order.
+    conn.execute(
+        "UPDATE articles SET updated_at = ? WHERE id = ?",
+        (datetime.utcnow().isoformat(), article_id),
+    )
 
 
 def upsert_article_tags(conn, article_id, tags):
+    tags = custom_tags(tags)
     if not tags:
         return
     cur = conn.cursor()
@@ -127,65 +481,496 @@ def upsert_article_tags(conn, article_id, tags):
             "INSERT OR IGNORE INTO article_tags (article_id, tag) VALUES (?, ?)",
             (article_id, tag),
         )
-    conn.commit()
+
+
+def get_article_tag_state(conn, article_id):
+    row = conn.execute(
+        "SELECT publish_date, tags_mask FROM articles WHERE id = ?", (article_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    tags = mask_to_tags(row["tags_mask"])
+    if row["tags_mask"] & CUSTOM_TAGS_BIT:
+        tags.extend(
+            tag_row["tag"]
+            for tag_row in conn.execute(
+                "SELECT tag FROM article_tags WHERE article_id = ? ORDER BY tag",
+                (article_id,),
+            )
+        )
+    return row["publish_date"], tags
+
+
+def adjust_daily_tag_counts(conn, day, tags, delta):
+    if not day:
+        return
+    for tag in [ALL_TAGS_KEY, *tags]:
+        conn.execute(
+            """
+            INSERT INTO daily_tag_counts (day, tag, count)
+            VALUES (?, ?, ?)
+            ON CONFLICT(day, tag) DO UPDATE SET count = count + excluded.count
+            """,
+            (day, tag, delta),
+        )
+    conn.execute("DELETE FROM daily_tag_counts WHERE day = ? AND count <= 0", (day,))
+
+
+def update_daily_tag_counts(conn, previous, current):
+    if previous == current:
+        return
+    if previous:
+        adjust_daily_tag_counts(conn, previous[0], previous[1], -1)
+    if current:
+        adjust_daily_tag_counts(conn, current[0], current[1], 1)
+
+
+def rebuild_daily_tag_counts(conn):
+    counts = {}
+    for row in conn.execute(
+        """
+        SELECT publish_date, tags_mask, COUNT(*) AS count
+        FROM articles
+        WHERE publish_date IS NOT NULL
+        GROUP BY publish_date, tags_mask
+        """
+    ):
+        for tag in [ALL_TAGS_KEY, *mask_to_tags(row["tags_mask"])]:
+            key = (row["publish_date"], tag)
+            counts[key] = counts.get(key, 0) + row["count"]
+    conn.execute("DELETE FROM daily_tag_counts")
+    conn.executemany(
+        "INSERT INTO daily_tag_counts (day, tag, count) VALUES (?, ?, ?)",
+        [(day, tag, count) for (day, tag), count in counts.items()],
+    )
+    conn.execute(
+        """
+        INSERT INTO daily_tag_counts (day, tag, count)
+        SELECT articles.publish_date, article_tags.tag, COUNT(*)
+        FROM article_tags
+        JOIN articles ON articles.id = article_tags.article_id
+        WHERE articles.publish_date IS NOT NULL
+        GROUP BY articles.publish_date, article_tags.tag
+        ON CONFLICT(day, tag) DO UPDATE SET count = count + excluded.count
+        """
+    )
+    set_meta(conn, "daily_tag_counts_built", "1")
+
+
+def get_daily_tag_counts(conn, start_day, end_day):
+    return conn.execute(
+        """
+        SELECT day, tag, count
+        FROM daily_tag_counts
+        WHERE day BETWEEN ? AND ?
+        ORDER BY day
+        """,
+        (start_day, end_day),
+    ).fetchall()
+
+
+def sum_daily_tag_counts(conn, start_day, end_day, tag=ALL_TAGS_KEY):
+    row = conn.execute(
+        """
+        SELECT COALESCE(SUM(count), 0)
+        FROM daily_tag_counts
+        WHERE day BETWEEN ? AND ? AND tag = ?
+        """,
+        (start_day, end_day, tag),
+    ).fetchone()
+    return row[0] if row else 0
 
 
 def _migrate_article_tags(conn):
     migrated = get_meta(conn, "article_tags_migrated")
     if migrated:
         return
+    vocabulary = ",".join(["?"] * len(TAG_VOCABULARY))
+    conn.execute(
+        f"""
+        INSERT OR IGNORE INTO article_tags (article_id, tag)
+        SELECT articles.id, tag.value
+        FROM articles, json_each(articles.tags) AS tag
+        WHERE json_valid(articles.tags) AND tag.value NOT IN ({vocabulary})
+        """,
+        TAG_VOCABULARY,
+    )
+    set_meta(conn, "article_tags_migrated", "1")
+    conn.commit()
+
+
+def tag_vocabulary_version():
+    return hashlib.sha1(json.dumps(TAG_VOCABULARY).encode("utf-8")).hexdigest()[:12]
+
+
+def _migrate_tags_mask(conn):
+    # Mask bits follow TAG_RULES order, so reordering or adding a tag changes what every
+    # stored bit means; recompute masks and custom tags from the JSON column when it moves.
+    version = tag_vocabulary_version()
+    if get_meta(conn, "tag_vocabulary") == version:
+        return
     rows = conn.execute(
         "SELECT id, tags FROM articles WHERE tags IS NOT NULL AND tags != ''"
     ).fetchall()
+    updates = []
     for row in rows:
         try:
             tags = json.loads(row["tags"]) if row["tags"] else []
         except json.JSONDecodeError:
             tags = []
-        upsert_article_tags(conn, row["id"], tags)
-    set_meta(conn, "article_tags_migrated", "1")
+        updates.append((tags_to_mask(tags), row["id"]))
+    conn.executemany("UPDATE articles SET tags_mask = ? WHERE id = ?", updates)
+    placeholders = ",".join(["?"] * len(TAG_VOCABULARY))
+    conn.execute(
+        f"DELETE FROM article_tags WHERE tag IN ({placeholders})", TAG_VOCABULARY
+    )
+    conn.execute(
+        f"""
+        INSERT OR IGNORE INTO article_tags (article_id, tag)
+        SELECT articles.id, tag.value
+        FROM articles, json_each(articles.tags) AS tag
+        WHERE json_valid(articles.tags) AND tag.value NOT IN ({placeholders})
+        """,
+        TAG_VOCABULARY,
+    )
+    rebuild_daily_tag_counts(conn)
+    set_meta(conn, "tag_vocabulary", version)
+    bump_generation(conn)
+    conn.commit()
+
+
+def _migrate_body_split(conn):
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(articles)")}
+    if "abstract" not in columns:
+        return
+    conn.create_function("compress_text", 1, compress_text, deterministic=True)
+    hot_columns = ", ".join(HOT_COLUMNS)
+    compressed = ", ".join(f"compress_text({column})" for column in BODY_COLUMNS)
+    conn.execute("BEGIN")
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO article_bodies (article_id, {", ".join(BODY_COLUMNS)})
+        SELECT id, {compressed} FROM articles
+        """
+    )
+    conn.execute(_articles_table_sql("articles_hot"))
+    conn.execute(
+        f"INSERT INTO articles_hot ({hot_columns}) SELECT {hot_columns} FROM articles"
+    )
+    conn.execute("DROP TABLE articles")
+    conn.execute("ALTER TABLE articles_hot RENAME TO articles")
+    conn.commit()
+
+
+def rank_rules_version():
+    payload = json.dumps(
+        [
+            IMPACT_POINTS,
+            STUDY_TYPE_POINTS,
+            JOURNAL_TIER_KEYS,
+            DEFAULT_JOURNAL_POINTS,
+            RANK_RECENCY_PER_DAY,
+            RANK_EPOCH.isoformat(),
+        ],
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def update_rank_scores(conn, missing_only=True):
+    conn.create_function("rank_score", 4, rank_score, deterministic=True)
+    conn.execute(
+        "UPDATE articles SET rank_score = rank_score(study_type, impact_level, journal, publish_date)"
+        + (" WHERE rank_score IS NULL" if missing_only else "")
+    )
+
+
+def _migrate_rank_scores(conn):
+    version = rank_rules_version()
+    if get_meta(conn, "rank_rules") == version:
+        return
+    update_rank_scores(conn, missing_only=False)
+    set_meta(conn, "rank_rules", version)
+    bump_generation(conn)
+    conn.commit()
 
 
 def _seed_if_empty(conn):
     if not os.path.exists(SEED_DB_PATH):
-        return
+        return 0
     row = conn.execute("SELECT COUNT(*) FROM articles").fetchone()
     if row and row[0]:
-        return
-    seed_conn = sqlite3.connect(SEED_DB_PATH)
-    seed_conn.row_factory = sqlite3.Row
-    seed_rows = seed_conn.execute(
-        "SELECT * FROM articles ORDER BY publish_date DESC LIMIT ?",
-        (SEED_LIMIT,),
-    ).fetchall()
-    if not seed_rows:
-        seed_conn.close()
-        return
-    columns = [
-        "id",
-        "title",
-        "abstract",
-        "journal",
-        "publish_date",
-        "url",
-        "tags",
-        "key_takeaway",
-        "study_type",
-        "primary_outcome",
-        "outcome_direction",
-        "pico_p",
-        "pico_i",
-        "pico_c",
-        "pico_o",
-        "impact_level",
-        "impact_reason",
-        "created_at",
-        "updated_at",
-    ]
-    placeholders = ",".join(["?"] * len(columns))
-    insert_sql = f"INSERT OR IGNORE INTO articles ({', '.join(columns)}) VALUES ({placeholders})"
-    for seed_row in seed_rows:
-        values = [seed_row[column] for column in columns]
-        conn.execute(insert_sql, values)
-    conn.commit()
-    seed_conn.close()
+        return 0
+    return seed_database(conn, SEED_DB_PATH, SEED_LIMIT)
+
+
+def _tags_mask_from_json(raw):
+    try:
+        tags = json.loads(raw) if raw else []
+    except json.JSONDecodeError:
+        tags = []
+    return tags_to_mask(tags)
+
+
+def _copy_seed_clusters(conn):
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO main.article_minhash (article_id, signature)
+        SELECT article_id, signature FROM seed.article_minhash
+        WHERE article_id IN (SELECT id FROM temp.seed_ids)
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO main.article_lsh (band, bucket, article_id)
+        SELECT band, bucket, article_id FROM seed.article_lsh
+        WHERE article_id IN (SELECT id FROM temp.seed_ids)
+        """
+    )
+    # A cluster whose first article was left out of the seed regroups under its earliest seeded one.
+    conn.execute(
+        """
+        UPDATE main.articles
+        SET cluster_id = COALESCE(
+            (
+                SELECT COALESCE(
+                    (SELECT id FROM main.articles WHERE id = source.cluster_id),
+                    (
+                        SELECT sibling.id FROM seed.articles AS sibling
+                        WHERE sibling.cluster_id = source.cluster_id
+                            AND sibling.id IN (SELECT id FROM temp.seed_ids)
+                        ORDER BY sibling.publish_date, sibling.created_at, sibling.id
+                        LIMIT 1
+                    )
+                )
+                FROM seed.articles AS source
+                WHERE source.id = main.articles.id
+            ),
+            id
+        )
+        WHERE id IN (SELECT article_id FROM main.article_minhash)
+            AND id IN (SELECT id FROM temp.seed_ids)
+        """
+    )
+
+
+def _copy_seed_postings(conn):
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO main.term_postings (term, article_id, tf, length)
+        SELECT term, article_id, tf, length FROM seed.term_postings
+        WHERE article_id IN (SELECT id FROM temp.seed_ids)
+        """
+    )
+    # Seed df counts cover the whole snapshot, so only the copied postings are counted here.
+    conn.execute(
+        """
+        INSERT INTO main.term_df (term, df)
+        SELECT term, COUNT(*) FROM main.term_postings
+        WHERE article_id IN (SELECT id FROM temp.seed_ids)
+        GROUP BY term
+        ON CONFLICT(term) DO UPDATE SET df = df + excluded.df
+        """
+    )
+    docs, tokens = conn.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(length), 0) FROM (
+            SELECT MAX(length) AS length FROM main.term_postings
+            WHERE article_id IN (SELECT id FROM temp.seed_ids)
+            GROUP BY article_id
+        )
+        """
+    ).fetchone()
+    add_meta_counter(conn, "related_docs", docs)
+    add_meta_counter(conn, "related_tokens", tokens)
+
+
+def seed_database(conn, path, limit=None):
+    conn.execute("ATTACH DATABASE ? AS seed", (path,))
+    try:
+        seed_tables = {
+            row["name"]
+            for row in conn.execute("SELECT name FROM seed.sqlite_master WHERE type = 'table'")
+        }
+        if "articles" not in seed_tables:
+            return 0
+        seed_columns = {row["name"] for row in conn.execute("PRAGMA seed.table_info(articles)")}
+        conn.create_function("compress_text", 1, compress_text, deterministic=True)
+        conn.create_function("tags_mask_from_json", 1, _tags_mask_from_json, deterministic=True)
+        vocabulary = ",".join(["?"] * len(TAG_VOCABULARY))
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS temp.seed_ids")
+        conn.execute("CREATE TEMP TABLE seed_ids (id TEXT PRIMARY KEY) WITHOUT ROWID")
+        conn.execute(
+            """
+            INSERT INTO temp.seed_ids (id)
+            SELECT id FROM seed.articles
+            WHERE id NOT IN (SELECT id FROM main.articles)
+            ORDER BY publish_date DESC
+            LIMIT ?
+            """,
+            (-1 if limit is None else limit,),
+        )
+        hot_columns = [column for column in HOT_COLUMNS if column != "tags_mask"]
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO main.articles ({", ".join(hot_columns)}, tags_mask)
+            SELECT {", ".join(hot_columns)}, tags_mask_from_json(tags)
+            FROM seed.articles
+            WHERE id IN (SELECT id FROM temp.seed_ids)
+            """
+        )
+        if "abstract" in seed_columns:
+            compressed = ", ".join(f"compress_text({column})" for column in BODY_COLUMNS)
+            conn.execute(
+                f"""
+                INSERT OR IGNORE INTO main.article_bodies (article_id, {", ".join(BODY_COLUMNS)})
+                SELECT id, {compressed}
+                FROM seed.articles
+                WHERE id IN (SELECT id FROM temp.seed_ids)
+                """
+            )
+        elif "article_bodies" in seed_tables:
+            conn.execute(
+                f"""
+                INSERT OR IGNORE INTO main.article_bodies (article_id, {", ".join(BODY_COLUMNS)})
+                SELECT article_id, {", ".join(BODY_COLUMNS)}
+                FROM seed.article_bodies
+                WHERE article_id IN (SELECT id FROM temp.seed_ids)
+                """
+            )
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO main.article_tags (article_id, tag)
+            SELECT articles.id, tag.value
+            FROM main.articles AS articles, json_each(articles.tags) AS tag
+            WHERE articles.tags_mask & ?
+                AND articles.id IN (SELECT id FROM temp.seed_ids)
+                AND json_valid(articles.tags)
+                AND tag.value NOT IN ({vocabulary})
+            """,
+            [CUSTOM_TAGS_BIT, *TAG_VOCABULARY],
+        )
+        if "article_summaries" in seed_tables:
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO main.article_summaries (article_id, summary_json, updated_at)
+                SELECT article_id, summary_json, updated_at
+                FROM seed.article_summaries
+                WHERE article_id IN (SELECT id FROM temp.seed_ids)
+                """
+            )
+        if {"article_minhash", "article_lsh"} <= seed_tables and "cluster_id" in seed_columns:
+            _copy_seed_clusters(conn)
+        if "term_postings" in seed_tables:
+            _copy_seed_postings(conn)
+        # Snapshot stamps are older than any client's sync token; seeded rows are new here.
+        conn.execute(
+            "UPDATE main.articles SET updated_at = ? WHERE id IN (SELECT id FROM temp.seed_ids)",
+            (datetime.utcnow().isoformat(),),
+        )
+        seeded = conn.execute("SELECT COUNT(*) FROM temp.seed_ids").fetchone()[0]
+        conn.execute("DROP TABLE temp.seed_ids")
+        update_rank_scores(conn)
+        rebuild_daily_tag_counts(conn)
+        if seeded:
+            bump_generation(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE seed")
+    return seeded
+
+
+def backfill(conn, query, prepare, apply, batch_rows, progress=None):
+    # prepare runs on a separate reader outside the lock; each batch is applied as its own write.
+    reader = get_db()
+    cursor = reader.execute(query)
+    done = 0
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            batch = [(row["id"], prepare(row)) for row in rows]
+            with write_lock():
+                for article_id, value in batch:
+                    apply(conn, article_id, value)
+                bump_generation(conn)
+                conn.commit()
+                publish_data_version(conn)
+            done += len(rows)
+            if progress:
+                progress(done)
+    finally:
+        reader.close()
+    return done
+
+
+def index_articles(conn, progress=None):
+    # Imported here: both modules import db.
+    import dedupe
+    import related
+
+    return dedupe.cluster_missing(conn, progress), related.index_missing(conn, progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nephro Brain database maintenance.")
+    parser.add_argument(
+        "command",
+        choices=["rebuild-counts", "rescore", "seed"],
+        help=(
+            "rebuild-counts: recompute the daily_tag_counts rollup from articles; "
+            "rescore: recompute every article's rank_score; "
+            "seed: bulk-copy articles from a seed snapshot."
+        ),
+    )
+    parser.add_argument(
+        "--seed-path",
+        default=SEED_DB_PATH,
+        help="Seed snapshot to import (defaults to seed_db.sqlite3).",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Import only the N most recent seed articles (default: all).",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="After seeding, cluster and index any articles the snapshot had no index rows for.",
+    )
+    args = parser.parse_args()
+    init_db()
+    conn = get_db()
+    if args.command == "rebuild-counts":
+        with write_lock():
+            rebuild_daily_tag_counts(conn)
+            conn.commit()
+        total = sum_daily_tag_counts(conn, "0000-00-00", "9999-99-99")
+        print(f"Rebuilt daily tag counts for {total} articles.")
+    elif args.command == "rescore":
+        with write_lock():
+            update_rank_scores(conn, missing_only=False)
+            set_meta(conn, "rank_rules", rank_rules_version())
+            bump_generation(conn)
+            conn.commit()
+            publish_data_version(conn)
+        print("Recomputed rank scores.")
+    elif args.command == "seed":
+        with write_lock():
+            seeded = seed_database(conn, args.seed_path, args.limit)
+            publish_data_version(conn)
+        print(f"Seeded {seeded} articles from {args.seed_path}.")
+        if args.index:
+            clustered, indexed = index_articles(conn)
+            print(f"Clustered {clustered} and indexed {indexed} articles.")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
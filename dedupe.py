@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import os
+import random
+import re
+import struct
+import time
+
+import db
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+SHINGLE_WORDS = 3
+DUPLICATE_THRESHOLD = float(os.environ.get("DUPLICATE_THRESHOLD", 0.7))
+MAX_CANDIDATES = 200
+REBUILD_BATCH_ROWS = 500
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = tuple(
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+)
+_SIGNATURE_FORMAT = f"<{MINHASH_PERMUTATIONS}Q"
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def shingles(text):
+    tokens = _TOKEN_PATTERN.findall((text or "").lower())
+    if len(tokens) < SHINGLE_WORDS:
+        return {" ".join(tokens)} if tokens else set()
+    return {
+        " ".join(tokens[index : index + SHINGLE_WORDS])
+        for index in range(len(tokens) - SHINGLE_WORDS + 1)
+    }
+
+
+def signature(title, abstract):
+    hashes = [_hash64(shingle.encode("utf-8")) for shingle in shingles(f"{title} {abstract}")]
+    if not hashes:
+        return None
+    return [
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes) for a, b in _PERMUTATIONS
+    ]
+
+
+def similarity(left, right):
+    return sum(1 for a, b in zip(left, right) if a == b) / MINHASH_PERMUTATIONS
+
+
+def pack_signature(values):
+    return struct.pack(_SIGNATURE_FORMAT, *values)
+
+
+def unpack_signature(blob):
+    return struct.unpack(_SIGNATURE_FORMAT, blob)
+
+
+def band_buckets(values):
+    packed = pack_signature(values)
+    width = LSH_ROWS * 8
+    return [
+        (band, _hash64(packed[band * width : (band + 1) * width]) - (1 << 63))
+        for band in range(LSH_BANDS)
+    ]
+
+
+def find_cluster(conn, article_id, values):
+    buckets = band_buckets(values)
+    # Joining a VALUES probe lets SQLite seek the (band, bucket) key; a row-value IN scans.
+    rows = conn.execute(
+        f"""
+        WITH probe(band, bucket) AS (VALUES {", ".join(["(?, ?)"] * len(buckets))})
+        SELECT DISTINCT article_lsh.article_id
+        FROM probe
+        JOIN article_lsh ON article_lsh.band = probe.band AND article_lsh.bucket = probe.bucket
+        WHERE article_lsh.article_id != ?
+        LIMIT ?
+        """,
+        [value for bucket in buckets for value in bucket] + [article_id, MAX_CANDIDATES],
+    ).fetchall()
+    if not rows:
+        return None, 0.0
+    candidates = [row["article_id"] for row in rows]
+    best_id, best_score = None, 0.0
+    for row in conn.execute(
+        f"""
+        SELECT article_minhash.article_id, article_minhash.signature,
+            COALESCE(articles.cluster_id, articles.id) AS cluster_id
+        FROM article_minhash
+        JOIN articles ON articles.id = article_minhash.article_id
+        WHERE article_minhash.article_id IN ({", ".join(["?"] * len(candidates))})
+        """,
+        candidates,
+    ):
+        score = similarity(values, unpack_signature(row["signature"]))
+        if score > best_score:
+            best_id, best_score = row["cluster_id"], score
+    if best_score < DUPLICATE_THRESHOLD:
+        return None, best_score
+    return best_id, best_score
+
+
+def assign_cluster(conn, article_id, values):
+    if values is None:
+        return None
+    packed = pack_signature(values)
+    existing = conn.execute(
+        """
+        SELECT article_minhash.signature, articles.cluster_id
+        FROM articles
+        LEFT JOIN article_minhash ON article_minhash.article_id = articles.id
+        WHERE articles.id = ?
+        """,
+        (article_id,),
+    ).fetchone()
+    if existing is None:
+        return None
+    if existing["signature"] == packed and existing["cluster_id"]:
+        return existing["cluster_id"]
+    cluster_id, _ = find_cluster(conn, article_id, values)
+    cluster_id = cluster_id or article_id
+    conn.execute(
+        "INSERT OR REPLACE INTO article_minhash (article_id, signature) VALUES (?, ?)",
+        (article_id, packed),
+    )
+    conn.execute("DELETE FROM article_lsh WHERE article_id = ?", (article_id,))
+    conn.executemany(
+        "INSERT OR IGNORE INTO article_lsh (band, bucket, article_id) VALUES (?, ?, ?)",
+        [(band, bucket, article_id) for band, bucket in band_buckets(values)],
+    )
+    conn.execute("UPDATE articles SET cluster_id = ? WHERE id = ?", (cluster_id, article_id))
+    return cluster_id
+
+
+_SOURCE_QUERY = """
+    SELECT articles.id, articles.title, article_bodies.abstract
+    FROM articles
+    LEFT JOIN article_bodies ON article_bodies.article_id = articles.id
+"""
+
+
+def _row_signature(row):
+    return signature(row["title"], db.decompress_text(row["abstract"]) or "")
+
+
+def cluster_missing(conn, progress=None):
+    query = f"""
+        {_SOURCE_QUERY}
+        WHERE articles.id NOT IN (SELECT article_id FROM article_minhash)
+        ORDER BY articles.publish_date, articles.created_at, articles.id
+    """
+    return db.backfill(conn, query, _row_signature, assign_cluster, REBUILD_BATCH_ROWS, progress)
+
+
+def rebuild(conn, progress=None):
+    with db.write_lock():
+        conn.execute("DELETE FROM article_lsh")
+        conn.execute("DELETE FROM article_minhash")
+        conn.execute("UPDATE articles SET cluster_id = NULL")
+        db.bump_generation(conn)
+        conn.commit()
+        db.publish_data_version(conn)
+    return cluster_missing(conn, progress)
+
+
+def cluster_stats(conn):
+    row = conn.execute(
+        """
+        SELECT COUNT(*) AS articles,
+            COUNT(DISTINCT COALESCE(cluster_id, id)) AS clusters
+        FROM articles
+        """
+    ).fetchone()
+    return {
+        "articles": row["articles"],
+        "clusters": row["clusters"],
+        "duplicates": row["articles"] - row["clusters"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate clustering with MinHash/LSH.")
+    parser.add_argument(
+        "command",
+        choices=["rebuild", "stats"],
+        help="rebuild: recompute signatures and clusters for every article; stats: summary.",
+    )
+    args = parser.parse_args()
+    db.init_db()
+    conn = db.get_db()
+    if args.command == "rebuild":
+        started = time.perf_counter()
+        done = rebuild(conn, lambda count: print(f"{count} articles", end="\r", flush=True))
+        print(f"\nClustered {done} articles in {time.perf_counter() - started:.1f}s")
+    print(cluster_stats(conn))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import hashlib
+import os
+from datetime import date, timedelta
+
+import db
+import writer
+from compress import precompress_static
+from serialization import dumps
+
+DIGEST_SIZE = int(os.environ.get("DIGEST_SIZE", 10))
+DIGEST_WINDOW_DAYS = int(os.environ.get("DIGEST_WINDOW_DAYS", 7))
+DIGEST_KEEP = int(os.environ.get("DIGEST_KEEP", 30))
+DIGEST_COLUMNS = [
+    "id",
+    "title",
+    "journal",
+    "publish_date",
+    "url",
+    "tags",
+    "tags_mask",
+    "key_takeaway",
+    "study_type",
+    "impact_level",
+    "rank_score",
+]
+
+
+def digest_dir():
+    return os.environ.get("DIGEST_DIR") or f"{db.DB_PATH}.digests"
+
+
+def digest_name(day, content_hash):
+    return f"digest-{day}-{content_hash}.json"
+
+
+def build_digest(conn, day, size=DIGEST_SIZE, window_days=DIGEST_WINDOW_DAYS):
+    start = (day - timedelta(days=window_days - 1)).isoformat()
+    columns = ", ".join(DIGEST_COLUMNS)
+    # One card per near-duplicate cluster: the best-ranked member represents it.
+    query = (
+        f"SELECT {columns} FROM (SELECT {columns}, ROW_NUMBER() OVER ("
+        "PARTITION BY COALESCE(cluster_id, id) ORDER BY rank_score DESC, id) AS cluster_rank "
+        "FROM articles WHERE publish_date BETWEEN ? AND ? {clause}) "
+        "WHERE cluster_rank = 1 ORDER BY rank_score DESC, id LIMIT ?"
+    )
+    articles = {}
+    tags = {}
+    for tag in [db.ALL_TAGS_KEY, *db.TAG_VOCABULARY]:
+        if tag == db.ALL_TAGS_KEY:
+            clause, params = "", []
+        else:
+            clause, params = "AND tags_mask & ?", [db.TAG_BITS[tag]]
+        rows = conn.execute(
+            query.format(clause=clause), [start, day.isoformat(), *params, size]
+        ).fetchall()
+        tags[tag] = [row["id"] for row in rows]
+        for row in rows:
+            if row["id"] not in articles:
+                item = {column: row[column] for column in DIGEST_COLUMNS if column != "tags_mask"}
+                item["tags"] = db.row_tags(row)
+                articles[row["id"]] = item
+    return {
+        "day": day.isoformat(),
+        "last_sync": db.get_meta(conn, "last_sync"),
+        "window_start": start,
+        "size": size,
+        "articles": articles,
+        "tags": tags,
+    }
+
+
+def _is_current(version, day):
+    name = version.get("digest")
+    return (
+        bool(name)
+        and name.startswith(f"digest-{day.isoformat()}-")
+        and version.get("digest_generation") == version.get("generation")
+        and os.path.exists(os.path.join(digest_dir(), name))
+    )
+
+
+def publish_digest(conn, day=None):
+    day = day or date.today()
+    version = db.get_data_version(conn)
+    if _is_current(version, day):
+        return version["digest"]
+    body = dumps(build_digest(conn, day))
+    name = digest_name(day.isoformat(), hashlib.sha256(body).hexdigest()[:16])
+    directory = digest_dir()
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as handle:
+            handle.write(body)
+        os.replace(tmp_path, path)
+        precompress_static(directory)
+        _prune(directory)
+    db.set_meta(conn, "digest", name)
+    db.set_meta(conn, "digest_generation", str(version["generation"]))
+    return name
+
+
+def _prune(directory):
+    names = sorted(
+        (name for name in os.listdir(directory) if name.endswith(".json")),
+        key=lambda name: os.path.getmtime(os.path.join(directory, name)),
+    )
+    for name in names[:-DIGEST_KEEP] if DIGEST_KEEP > 0 else []:
+        for suffix in ("", ".gz", ".br"):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def published_digest(day=None):
+    version = db.current_data_version()
+    return version["digest"] if _is_current(version, day or date.today()) else None
+
+
+def current_digest(day=None):
+    return published_digest(day) or writer.call(publish_digest, day)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the ranked daily digest.")
+    parser.add_argument("--date", default="", help="Digest day (YYYY-MM-DD, defaults to today).")
+    args = parser.parse_args()
+    day = date.fromisoformat(args.date) if args.date else None
+    db.init_db()
+    name = writer.call(publish_digest, day)
+    print(os.path.join(digest_dir(), name))
+
+
+if __name__ == "__main__":
+    main()
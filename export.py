@@ -0,0 +1,217 @@
+import argparse
+import csv
+import io
+import sys
+import zlib
+from datetime import date, datetime, timedelta
+
+import db
+from serialization import dumps
+
+EXPORT_CHUNK_ROWS = 200
+EXPORT_COLUMNS = [
+    "id",
+    "title",
+    "journal",
+    "publish_date",
+    "url",
+    "tags",
+    "study_type",
+    "impact_level",
+    "key_takeaway",
+    "primary_outcome",
+    "abstract",
+]
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ris": ("application/x-research-info-systems; charset=utf-8", "ris"),
+    "jsonl": ("application/x-ndjson; charset=utf-8", "jsonl"),
+}
+
+
+def parse_bound(value, is_end):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        pass
+    month = datetime.strptime(value, "%Y-%m").date().replace(day=1)
+    if not is_end:
+        return month
+    next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def selection_query(start=None, end=None, tags=None, search="", collapse=False, abstract=True):
+    where_clauses = []
+    params = []
+    if start:
+        where_clauses.append("articles.publish_date >= ?")
+        params.append(start.isoformat())
+    if end:
+        where_clauses.append("articles.publish_date <= ?")
+        params.append(end.isoformat())
+    if tags:
+        tag_clause, tag_params = db.tag_filter(tags)
+        where_clauses.append(tag_clause)
+        params.extend(tag_params)
+    for word in search.split():
+        where_clauses.append(
+            "(articles.title LIKE ? ESCAPE '\\' OR articles.journal LIKE ? ESCAPE '\\')"
+        )
+        escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.extend([f"%{escaped}%", f"%{escaped}%"])
+    if collapse:
+        collapse_sql, collapse_params = db.collapse_clause(where_clauses, params)
+        where_clauses.append(collapse_sql)
+        params = params + collapse_params
+    columns = [f"articles.{column}" for column in EXPORT_COLUMNS if column != "abstract"]
+    columns.append("articles.tags_mask")
+    source = "articles"
+    if abstract:
+        columns.append("article_bodies.abstract")
+        source += " LEFT JOIN article_bodies ON article_bodies.article_id = articles.id"
+    where = f" WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    query = (
+        f"SELECT {', '.join(columns)} FROM {source}{where} "
+        "ORDER BY articles.publish_date DESC, articles.id"
+    )
+    return query, params
+
+
+def _record(row):
+    record = {
+        column: row[column] for column in EXPORT_COLUMNS if column not in ("tags", "abstract")
+    }
+    record["tags"] = db.row_tags(row)
+    if "abstract" in row.keys():
+        record["abstract"] = db.decompress_text(row["abstract"])
+    return record
+
+
+def _csv_cell(value):
+    # Spreadsheets evaluate cells starting with these as formulas.
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _csv_lines(records, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for record in records:
+        writer.writerow(
+            [
+                _csv_cell("; ".join(record["tags"]) if column == "tags" else record.get(column))
+                for column in EXPORT_COLUMNS
+            ]
+        )
+    return buffer.getvalue().encode("utf-8")
+
+
+def _ris_value(value):
+    # RIS is one tag per line, so an embedded newline would start a bogus record line.
+    return " ".join(str(value).split())
+
+
+def _ris_entry(record):
+    lines = ["TY  - JOUR", f"AN  - {record['id']}", f"TI  - {_ris_value(record['title'])}"]
+    if record["journal"]:
+        lines.append(f"JO  - {_ris_value(record['journal'])}")
+    if record["publish_date"]:
+        lines.append(f"PY  - {record['publish_date'][:4]}")
+        lines.append(f"DA  - {record['publish_date'].replace('-', '/')}")
+    if record["url"]:
+        lines.append(f"UR  - {_ris_value(record['url'])}")
+    lines.extend(f"KW  - {_ris_value(tag)}" for tag in record["tags"])
+    if record["study_type"]:
+        lines.append(f"N1  - {_ris_value(record['study_type'])}")
+    if record["key_takeaway"]:
+        lines.append(f"N1  - {_ris_value(record['key_takeaway'])}")
+    if record.get("abstract"):
+        lines.append(f"AB  - {_ris_value(record['abstract'])}")
+    lines.append("ER  - ")
+    return "\r\n".join(lines) + "\r\n\r\n"
+
+
+def _ris_lines(records, header):
+    return "".join(_ris_entry(record) for record in records).encode("utf-8")
+
+
+def _jsonl_lines(records, header):
+    return b"".join(dumps(record) + b"\n" for record in records)
+
+
+_RENDERERS = {"csv": _csv_lines, "ris": _ris_lines, "jsonl": _jsonl_lines}
+
+
+def export_chunks(conn, fmt, query, params):
+    render = _RENDERERS[fmt]
+    cursor = conn.execute(query, params)
+    header = True
+    while True:
+        rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+        chunk = render([_record(row) for row in rows], header)
+        if chunk:
+            yield chunk
+        if not rows:
+            break
+        header = False
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_filename(fmt, start=None, end=None, compressed=False):
+    span = "-".join(value.isoformat() for value in (start, end) if value)
+    span = span or date.today().isoformat()
+    return f"nephro-brain-{span}.{FORMATS[fmt][1]}" + (".gz" if compressed else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export articles for journal club.")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--start", default="", help="YYYY-MM-DD or YYYY-MM.")
+    parser.add_argument("--end", default="", help="YYYY-MM-DD or YYYY-MM.")
+    parser.add_argument("--tags", default="", help="Comma-separated tags (any match).")
+    parser.add_argument(
+        "--search", default="", help="Words that must all appear in the title or journal."
+    )
+    parser.add_argument(
+        "--collapse", action="store_true", help="One article per near-duplicate cluster."
+    )
+    parser.add_argument("--no-abstract", action="store_true", help="Leave abstracts out.")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output.")
+    parser.add_argument("--output", default="", help="Output file (defaults to stdout).")
+    args = parser.parse_args()
+    start = parse_bound(args.start, False) if args.start else None
+    end = parse_bound(args.end, True) if args.end else None
+    tags = [tag.strip() for tag in args.tags.split(",") if tag.strip()]
+    query, params = selection_query(
+        start, end, tags, args.search, args.collapse, not args.no_abstract
+    )
+    db.init_db()
+    conn = db.get_db()
+    chunks = export_chunks(conn, args.format, query, params)
+    if args.gzip:
+        chunks = gzip_chunks(chunks)
+    handle = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            handle.write(chunk)
+    finally:
+        conn.close()
+        if args.output:
+            handle.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,34 @@
 import argparse
 import json
+import logging
 import os
 from datetime import date, datetime, timedelta, timezone
 from xml.etree import ElementTree as ET
 
 import requests
 
-from ai import infer_tags, impact_assessment, pico_from_text, summarize
-from db import get_db, init_db, set_meta, upsert_article_tags
+from ai import infer_tags, impact_assessment, pico_from_text, rank_score, summarize
+import profiling
+import shards
+import writer
+from dedupe import assign_cluster, signature
+from digest import publish_digest
+from metrics import count_ingest, timed_outbound
+from related import index_article, term_counts
+from db import (
+    bump_generation,
+    get_article_tag_state,
+    init_db,
+    set_meta,
+    tags_to_mask,
+    update_daily_tag_counts,
+    upsert_article_body,
+    upsert_article_tags,
+)
 
-BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+log = logging.getLogger(__name__)
+
+BASE_URL = os.environ.get("PUBMED_BASE_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils")
 DEFAULT_JOURNALS = [
     "New England Journal of Medicine",
     "N Engl J Med",
@@ -62,6 +81,13 @@ def _node_text(node):
     return "".join(node.itertext()).strip()
 
 
+def _pubmed_get(operation, params):
+    with timed_outbound("pubmed", operation):
+        response = requests.get(f"{BASE_URL}/{operation}.fcgi", params=params, timeout=30)
+        response.raise_for_status()
+    return response
+
+
 def fetch_article_ids(journal, start_date, end_date, max_per_journal):
     query = f'"{journal}"[Journal]'
     base_params = {
@@ -73,16 +99,12 @@ def fetch_article_ids(journal, start_date, end_date, max_per_journal):
     }
     if max_per_journal and max_per_journal > 0:
         params = {**base_params, "retmax": max_per_journal}
-        response = requests.get(f"{BASE_URL}/esearch.fcgi", params=params, timeout=30)
-        response.raise_for_status()
+        response = _pubmed_get("esearch", params)
         root = ET.fromstring(response.text)
         return [el.text for el in root.findall(".//Id") if el.text]
 
     count_params = {**base_params, "retmax": 0}
-    count_response = requests.get(
-        f"{BASE_URL}/esearch.fcgi", params=count_params, timeout=30
-    )
-    count_response.raise_for_status()
+    count_response = _pubmed_get("esearch", count_params)
     count_root = ET.fromstring(count_response.text)
     count_text = count_root.findtext(".//Count", "0")
     total = int(count_text) if count_text.isdigit() else 0
@@ -93,8 +115,7 @@ def fetch_article_ids(journal, start_date, end_date, max_per_journal):
     ids = []
     for retstart in range(0, total, batch_size):
         params = {**base_params, "retmax": batch_size, "retstart": retstart}
-        response = requests.get(f"{BASE_URL}/esearch.fcgi", params=params, timeout=30)
-        response.raise_for_status()
+        response = _pubmed_get("esearch", params)
         root = ET.fromstring(response.text)
         ids.extend([el.text for el in root.findall(".//Id") if el.text])
     return ids
@@ -108,8 +129,7 @@ def fetch_article_details(pmids):
         "id": ",".join(pmids),
         "retmode": "xml",
     }
-    response = requests.get(f"{BASE_URL}/efetch.fcgi", params=params, timeout=30)
-    response.raise_for_status()
+    response = _pubmed_get("efetch", params)
     root = ET.fromstring(response.text)
     return root.findall(".//PubmedArticle")
 
@@ -169,81 +189,139 @@ def parse_article(article_node):
 
 def upsert_article(conn, article):
     now = datetime.utcnow().isoformat()
+    changes_before = conn.total_changes
     cur = conn.cursor()
     cur.execute(
         """
         INSERT INTO articles (
-            id, title, abstract, journal, publish_date, url, tags,
+            id, title, journal, publish_date, url, tags, tags_mask,
             key_takeaway, study_type, primary_outcome, outcome_direction,
-            pico_p, pico_i, pico_c, pico_o, impact_level, impact_reason,
-            created_at, updated_at
+            impact_level, impact_reason, rank_score, created_at, updated_at
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ON CONFLICT(id) DO UPDATE SET
             title = excluded.title,
-            abstract = excluded.abstract,
             journal = excluded.journal,
             publish_date = excluded.publish_date,
             url = excluded.url,
             tags = excluded.tags,
+            tags_mask = excluded.tags_mask,
             key_takeaway = excluded.key_takeaway,
             study_type = excluded.study_type,
             primary_outcome = excluded.primary_outcome,
             outcome_direction = excluded.outcome_direction,
-            pico_p = excluded.pico_p,
-            pico_i = excluded.pico_i,
-            pico_c = excluded.pico_c,
-            pico_o = excluded.pico_o,
             impact_level = excluded.impact_level,
             impact_reason = excluded.impact_reason,
+            rank_score = excluded.rank_score,
             updated_at = excluded.updated_at
+        WHERE (
+            title, journal, publish_date, url, tags, tags_mask, key_takeaway,
+            study_type, primary_outcome, outcome_direction, impact_level, impact_reason,
+            rank_score
+        ) IS NOT (
+            excluded.title, excluded.journal, excluded.publish_date, excluded.url,
+            excluded.tags, excluded.tags_mask, excluded.key_takeaway, excluded.study_type,
+            excluded.primary_outcome, excluded.outcome_direction, excluded.impact_level,
+            excluded.impact_reason, excluded.rank_score
+        )
         """,
         (
             article["id"],
             article["title"],
-            article["abstract"],
             article["journal"],
             article["publish_date"],
             article["url"],
             json.dumps(article["tags"]),
+            tags_to_mask(article["tags"]),
             article["key_takeaway"],
             article["study_type"],
             article["primary_outcome"],
             article["outcome_direction"],
-            article["pico"]["P"],
-            article["pico"]["I"],
-            article["pico"]["C"],
-            article["pico"]["O"],
             article["impact"]["level"],
             article["impact"]["reason"],
+            rank_score(
+                article["study_type"],
+                article["impact"]["level"],
+                article["journal"],
+                article["publish_date"],
+            ),
             now,
             now,
         ),
     )
-    conn.commit()
+    article_changed = conn.total_changes != changes_before
+    upsert_article_body(
+        conn,
+        article["id"],
+        {
+            "abstract": article["abstract"],
+            "pico_p": article["pico"]["P"],
+            "pico_i": article["pico"]["I"],
+            "pico_c": article["pico"]["C"],
+            "pico_o": article["pico"]["O"],
+        },
+    )
+    if article_changed:
+        return True
+    if conn.total_changes == changes_before:
+        return False
+    conn.execute("UPDATE articles SET updated_at = ? WHERE id = ?", (now, article["id"]))
+    return True
 
 
-def run_ingest_range(journals, start_date, end_date, max_per_journal):
+def store_article(conn, article):
+    previous = get_article_tag_state(conn, article["id"])
+    changes_before = conn.total_changes
+    changed = upsert_article(conn, article)
+    upsert_article_tags(conn, article["id"], article["tags"])
+    cluster_id = assign_cluster(conn, article["id"], article.get("minhash"))
+    if cluster_id and cluster_id != article["id"]:
+        count_ingest("clustered")
+    index_article(conn, article["id"], article.get("terms"))
+    if not changed and conn.total_changes == changes_before:
+        return False
+    update_daily_tag_counts(conn, previous, get_article_tag_state(conn, article["id"]))
+    bump_generation(conn)
+    return True
+
+
+def mark_synced(conn):
+    set_meta(conn, "last_sync", datetime.now(timezone.utc).isoformat())
+
+
+def run_ingest_range(journals, start_date, end_date, max_per_journal, profile=None):
     init_db()
-    conn = get_db()
-    stored = 0
+    stages = profiling.ingest_profile(profile)
+    pending = []
     for journal in journals:
-        pmids = fetch_article_ids(journal, start_date, end_date, max_per_journal)
+        with stages.stage("esearch"):
+            pmids = fetch_article_ids(journal, start_date, end_date, max_per_journal)
         if not pmids:
             continue
-        for article_node in fetch_article_details(pmids):
-            parsed = parse_article(article_node)
+        count_ingest("fetched", len(pmids))
+        with stages.stage("efetch"):
+            article_nodes = fetch_article_details(pmids)
+        for article_node in article_nodes:
+            with stages.stage("parse"):
+                parsed = parse_article(article_node)
             if not parsed:
+                count_ingest("skipped")
                 continue
-            tags = infer_tags(parsed["title"], parsed["abstract"])
-            summary = summarize(parsed["title"], parsed["abstract"], tags, translate=False)
-            pico = pico_from_text(
-                parsed["title"],
-                parsed["abstract"],
-                tags,
-                summary["primary_outcome"],
-            )
-            impact = impact_assessment(summary["study_type"], summary["outcome_direction"])
+            count_ingest("parsed")
+            with stages.stage("heuristics"):
+                tags = infer_tags(parsed["title"], parsed["abstract"])
+                summary = summarize(parsed["title"], parsed["abstract"], tags, translate=False)
+                pico = pico_from_text(
+                    parsed["title"],
+                    parsed["abstract"],
+                    tags,
+                    summary["primary_outcome"],
+                )
+                impact = impact_assessment(summary["study_type"], summary["outcome_direction"])
+            with stages.stage("minhash"):
+                minhash = signature(parsed["title"], parsed["abstract"])
+            with stages.stage("terms"):
+                terms = term_counts(parsed["title"], parsed["abstract"], pico)
             parsed.update(
                 {
                     "tags": tags,
@@ -253,20 +331,35 @@ def run_ingest_range(journals, start_date, end_date, max_per_journal):
                     "outcome_direction": summary["outcome_direction"],
                     "pico": pico,
                     "impact": impact,
+                    "minhash": minhash,
+                    "terms": terms,
                 }
             )
-            upsert_article(conn, parsed)
-            upsert_article_tags(conn, parsed["id"], tags)
-            stored += 1
-    set_meta(conn, "last_sync", datetime.now(timezone.utc).isoformat())
-    conn.close()
-    return stored
+            pending.append(writer.submit(stages.wrap("store", store_article), parsed))
+    # Only timed: holding the capture here would keep the writer's store jobs from being profiled.
+    with stages.stage("store_wait", capture=False):
+        for future in pending:
+            count_ingest("stored" if future.result() else "skipped")
+    writer.call(stages.wrap("store", mark_synced))
+    writer.call(stages.wrap("digest", publish_digest))
+    if shards.SHARD_EXPORT:
+        with stages.stage("shards"):
+            shards.export_shards()
+    if stages.enabled:
+        timings = stages.seconds()
+        log.info(
+            "Ingest stages: %s",
+            ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()),
+        )
+        for path in stages.finish():
+            log.info("Wrote ingest profile %s", path)
+    return len(pending)
 
 
-def run_ingest(journals, days, max_per_journal):
+def run_ingest(journals, days, max_per_journal, profile=None):
     start_date = date.today() - timedelta(days=days)
     end_date = date.today()
-    return run_ingest_range(journals, start_date, end_date, max_per_journal)
+    return run_ingest_range(journals, start_date, end_date, max_per_journal, profile)
 
 
 def main():
@@ -284,11 +377,17 @@ def main():
         default="",
         help="Comma-separated list of journals to query.",
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write per-stage profiles to $PROFILE_DIR (same as PROFILE_INGEST=1).",
+    )
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     journals = DEFAULT_JOURNALS
     if args.journals.strip():
         journals = [j.strip() for j in args.journals.split(",") if j.strip()]
-    stored = run_ingest(journals, args.days, args.max_per_journal)
+    stored = run_ingest(journals, args.days, args.max_per_journal, args.profile or None)
     print(f"Stored {stored} articles.")
 
 
@@ -0,0 +1,128 @@
+import math
+import os
+import threading
+import time
+
+TRUST_PROXY_HEADERS = os.environ.get("TRUST_PROXY_HEADERS", "0") == "1"
+MAX_TRACKED_CLIENTS = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                self._buckets[client] = (tokens, now)
+                retry_after = (1 - tokens) / self.rate
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._prune(now)
+        return retry_after
+
+    def refund(self, client):
+        with self._lock:
+            if client in self._buckets:
+                tokens, updated = self._buckets[client]
+                self._buckets[client] = (min(self.burst, tokens + 1), updated)
+
+    def _prune(self, now):
+        full_after = self.burst / self.rate
+        for client, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[client]
+
+
+class EndpointLimit:
+    def __init__(self, name, concurrency, rate_per_minute, burst, busy_retry_after):
+        self.name = name
+        self.concurrency = concurrency
+        self.busy_retry_after = busy_retry_after
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency > 0 else None
+        self._bucket = TokenBucket(rate_per_minute, burst)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._admitted = 0
+        self._rate_limited = 0
+        self._busy = 0
+
+    def try_acquire(self, client):
+        retry_after = self._bucket.take(client)
+        if retry_after > 0:
+            with self._lock:
+                self._rate_limited += 1
+            return 429, math.ceil(retry_after)
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            self._bucket.refund(client)
+            with self._lock:
+                self._busy += 1
+            return 503, self.busy_retry_after
+        with self._lock:
+            self._active += 1
+            self._admitted += 1
+        return None
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "active": self._active,
+                "admitted": self._admitted,
+                "rate_limited": self._rate_limited,
+                "busy": self._busy,
+            }
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+REFRESH_LIMIT = EndpointLimit(
+    "refresh",
+    concurrency=_env_int("REFRESH_CONCURRENCY", 1),
+    rate_per_minute=_env_int("REFRESH_RATE_PER_MINUTE", 2),
+    burst=_env_int("REFRESH_BURST", 2),
+    busy_retry_after=30,
+)
+SUMMARY_LIMIT = EndpointLimit(
+    "summary",
+    concurrency=_env_int("SUMMARY_CONCURRENCY", 4),
+    rate_per_minute=_env_int("SUMMARY_RATE_PER_MINUTE", 10),
+    burst=_env_int("SUMMARY_BURST", 5),
+    busy_retry_after=5,
+)
+EXPORT_LIMIT = EndpointLimit(
+    "export",
+    concurrency=_env_int("EXPORT_CONCURRENCY", 2),
+    rate_per_minute=_env_int("EXPORT_RATE_PER_MINUTE", 6),
+    burst=_env_int("EXPORT_BURST", 3),
+    busy_retry_after=10,
+)
+ENDPOINT_LIMITS = [REFRESH_LIMIT, SUMMARY_LIMIT, EXPORT_LIMIT]
+
+
+def client_address(request):
+    if TRUST_PROXY_HEADERS and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or "unknown"
+
+
+def stats():
+    return {limit.name: limit.stats() for limit in ENDPOINT_LIMITS}
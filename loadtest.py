@@ -0,0 +1,296 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+
+import db
+import synthetic
+from stubs import OpenAIHandler, PubMedHandler, start_stub
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+LIST_FIELDS = "id,title,journal,publish_date,study_type,tags"
+LIST_PARAMS = f"fields={LIST_FIELDS}&collapse=1"
+SESSION_MIX = [
+    ("today_list", 30),
+    ("tag_filter", 20),
+    ("range_page", 15),
+    ("detail", 20),
+    ("batch", 8),
+    ("summary", 5),
+    ("refresh", 2),
+]
+
+
+def build_corpus(path, articles, days=365, seed=1):
+    end = date.today()
+    corpus = synthetic.iter_articles(articles, seed, end - timedelta(days=days), end)
+    return synthetic.build_database(path, corpus, heuristics=False)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, env, log_path):
+    port = _free_port()
+    if args.server == "serve":
+        command = [
+            sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--threads", str(args.threads),
+        ]
+    else:
+        command = [sys.executable, "app.py", "--host", "127.0.0.1", "--port", str(port)]
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=log)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path, encoding="utf-8", errors="replace") as log:
+                raise RuntimeError(log.read()[-4000:])
+        try:
+            requests.get(f"{base_url}/api/stats", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not start within 30s")
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.statuses = {}
+        self.errors = {}
+        self.shed = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, status):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+            statuses = self.statuses.setdefault(name, {})
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status in (429, 503):
+                self.shed[name] = self.shed.get(name, 0) + 1
+            elif status is None or status >= 500:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+class Session:
+    def __init__(self, base_url, recorder, rng, article_ids, client_ip):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng = rng
+        self.article_ids = article_ids
+        self.http = requests.Session()
+        self.http.headers["X-Forwarded-For"] = client_ip
+
+    def call(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=120, **kwargs)
+            response.content
+            status = response.status_code
+        except requests.RequestException:
+            response = None
+            status = None
+        self.recorder.record(name, time.perf_counter() - started, status)
+        return response
+
+    def today_list(self):
+        self.call("digest", "GET", "/api/digest")
+        self.call("latest_list", "GET", f"/api/articles?limit=50&{LIST_PARAMS}")
+
+    def tag_filter(self):
+        tag = requests.utils.quote(self.rng.choice(db.TAG_VOCABULARY))
+        self.call("tag_filter", "GET", f"/api/articles?limit=50&tags={tag}&{LIST_PARAMS}")
+
+    def range_page(self):
+        end = date.today().replace(day=1)
+        start = (end - timedelta(days=self.rng.randint(0, 300))).replace(day=1)
+        path = (
+            f"/api/articles/range?start={start:%Y-%m}&end={end:%Y-%m}"
+            f"&limit=50&{LIST_PARAMS}"
+        )
+        for offset in range(0, 50 * self.rng.randint(1, 3), 50):
+            self.call("range_page", "GET", f"{path}&offset={offset}")
+
+    def detail(self):
+        self.call("detail", "GET", f"/api/articles/{self.rng.choice(self.article_ids)}")
+
+    def batch(self):
+        ids = self.rng.sample(self.article_ids, min(50, len(self.article_ids)))
+        payload = {"ids": ids, "fields": LIST_FIELDS.split(",")}
+        self.call("batch", "POST", "/api/articles/batch", json=payload)
+
+    def summary(self):
+        self.call("summary", "POST", f"/api/articles/{self.rng.choice(self.article_ids)}/summary")
+
+    def refresh(self):
+        self.call("refresh", "POST", "/api/refresh?days=1&max_per_journal=3")
+
+
+def run_load(base_url, args, article_ids):
+    recorder = Recorder()
+    names = [name for name, _ in SESSION_MIX]
+    weights = [weight for _, weight in SESSION_MIX]
+    deadline = time.monotonic() + args.duration
+
+    def user(index):
+        rng = random.Random(args.seed * 1000 + index)
+        client_ip = f"10.0.{index // 256}.{index % 256}"
+        session = Session(base_url, recorder, rng, article_ids, client_ip)
+        while time.monotonic() < deadline:
+            getattr(session, rng.choices(names, weights)[0])()
+            if args.think_ms:
+                time.sleep(rng.expovariate(1000 / args.think_ms))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.monotonic() - started
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def summarize_results(recorder, elapsed):
+    endpoints = {}
+    for name, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        endpoints[name] = {
+            "requests": len(ordered),
+            "rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+            "errors": recorder.errors.get(name, 0),
+            "shed": recorder.shed.get(name, 0),
+            "statuses": recorder.statuses.get(name, {}),
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": total,
+        "rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current):
+    print(f"{'endpoint':<14} {'p50':>16} {'p95':>16} {'p99':>16} {'rps':>16}")
+    for name, stats in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            if base and base[key]:
+                change = (stats[key] - base[key]) / base[key] * 100
+                cells.append(f"{stats[key]:>8} ({change:+.0f}%)")
+            else:
+                cells.append(f"{stats[key]:>16}")
+        print(f"{name:<14} " + " ".join(f"{cell:>16}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API against a synthetic database.")
+    parser.add_argument("--articles", type=int, default=20000, help="Synthetic corpus size.")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent simulated sessions.")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load.")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between actions.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for corpus and sessions.")
+    parser.add_argument("--pubmed-latency-ms", type=float, default=200, help="PubMed stub delay.")
+    parser.add_argument("--openai-latency-ms", type=float, default=1500, help="OpenAI stub delay.")
+    parser.add_argument(
+        "--server", choices=["app", "serve"], default="app", help="Start app.py or serve.py."
+    )
+    parser.add_argument("--workers", type=int, default=2, help="Workers for --server serve.")
+    parser.add_argument("--threads", type=int, default=4, help="Threads for --server serve.")
+    parser.add_argument(
+        "--db-path", default="", help="Reuse this database instead of building one."
+    )
+    parser.add_argument("--output", default="loadtest-results.json", help="Where to write results.")
+    parser.add_argument("--compare", default="", help="Baseline results JSON to diff against.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="nephro-loadtest-")
+    db_path = args.db_path or os.path.join(workdir, "db.sqlite3")
+    if not args.db_path:
+        started = time.perf_counter()
+        build_corpus(db_path, args.articles, seed=args.seed)
+        print(f"Built {args.articles} synthetic articles in {time.perf_counter() - started:.1f}s")
+    db.DB_PATH = db_path
+    conn = db.get_db()
+    article_ids = [row["id"] for row in conn.execute("SELECT id FROM articles")]
+    conn.close()
+
+    pubmed, pubmed_url = start_stub(PubMedHandler, args.pubmed_latency_ms)
+    openai, openai_url = start_stub(OpenAIHandler, args.openai_latency_ms)
+    env = {
+        **os.environ,
+        "DB_PATH": db_path,
+        "PUBMED_BASE_URL": pubmed_url,
+        "OPENAI_API_URL": f"{openai_url}/v1/chat/completions",
+        "OPENAI_API_KEY": "loadtest",
+        "TRUST_PROXY_HEADERS": "1",
+    }
+    log_path = os.path.join(workdir, "server.log")
+    process, base_url = start_server(args, env, log_path)
+    print(f"Server log: {log_path}")
+    try:
+        recorder, elapsed = run_load(base_url, args, article_ids)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        pubmed.shutdown()
+        openai.shutdown()
+
+    results = summarize_results(recorder, elapsed)
+    results["config"] = {
+        key: value for key, value in vars(args).items() if key not in ("output", "compare")
+    }
+    results["commit"] = _git_commit()
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(results, handle, indent=2)
+    print(f"{results['requests']} requests in {results['elapsed_seconds']}s ({results['rps']} rps)")
+    for name, stats in results["endpoints"].items():
+        print(
+            f"{name:<14} n={stats['requests']:<6} p50={stats['p50_ms']}ms "
+            f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms "
+            f"errors={stats['errors']} shed={stats['shed']}"
+        )
+    print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            compare(json.load(handle), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = []
+_gauges = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total)) for labels, (counts, total) in self._values.items()
+            )
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+def register_gauge(name, help_text, labelnames, collect):
+    _gauges.append((name, help_text, labelnames, collect))
+
+
+def _render_gauge(name, help_text, labelnames, collect):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in collect():
+        lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+    return lines
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for gauge in _gauges:
+        lines.extend(_render_gauge(*gauge))
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "nephro_http_request_duration_seconds",
+    "Flask request latency by route.",
+    ("route", "method", "status"),
+)
+SQL_QUERY_SECONDS = Histogram(
+    "nephro_sql_query_duration_seconds",
+    "SQLite query latency by named query.",
+    ("query",),
+)
+OUTBOUND_REQUEST_SECONDS = Histogram(
+    "nephro_outbound_request_duration_seconds",
+    "Outbound HTTP latency by service and operation.",
+    ("service", "operation"),
+)
+OUTBOUND_REQUEST_ERRORS = Counter(
+    "nephro_outbound_request_errors_total",
+    "Outbound HTTP calls that raised (network errors, bad status, bad payload).",
+    ("service", "operation"),
+)
+INGEST_ARTICLES = Counter(
+    "nephro_ingest_articles_total",
+    "Articles seen by ingest, by stage (fetched, parsed, stored, skipped).",
+    ("stage",),
+)
+
+
+def observe_request(route, method, status, seconds):
+    HTTP_REQUEST_SECONDS.observe(seconds, route, method, str(status))
+
+
+@contextmanager
+def timed_query(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SQL_QUERY_SECONDS.observe(time.perf_counter() - started, name)
+
+
+@contextmanager
+def timed_outbound(service, operation):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        OUTBOUND_REQUEST_ERRORS.inc(service, operation)
+        raise
+    finally:
+        OUTBOUND_REQUEST_SECONDS.observe(time.perf_counter() - started, service, operation)
+
+
+def count_ingest(stage, amount=1):
+    INGEST_ARTICLES.inc(stage, amount=amount)
@@ -0,0 +1,208 @@
+import cProfile
+import functools
+import itertools
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "0") == "1"
+PROFILE_INGEST = os.environ.get("PROFILE_INGEST", "0") == "1"
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "cprofile")
+PROFILE_ROUTES = {
+    route.strip() for route in os.environ.get("PROFILE_ROUTES", "").split(",") if route.strip()
+}
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.01))
+PROFILE_HEADER = "X-Profile"
+PROFILE_HEADER_TOKEN = os.environ.get("PROFILE_HEADER_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 200))
+SAMPLING_INTERVAL = 0.001
+STAGE_CAPTURE_WAIT = 0.05
+
+_active_lock = threading.Lock()
+_sequence = itertools.count()
+
+
+class _Capture:
+    def __init__(self):
+        self.sampling = PROFILE_MODE == "sample" and SamplingProfiler is not None
+        if self.sampling:
+            self.profiler = SamplingProfiler(interval=SAMPLING_INTERVAL)
+        else:
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        if self.sampling:
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.sampling:
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+    def save(self, name):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-") or "root"
+        base = os.path.join(PROFILE_DIR, f"{stamp}-{os.getpid()}-{next(_sequence)}-{slug}")
+        if self.sampling:
+            path = f"{base}.html"
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(self.profiler.output_html())
+        else:
+            path = f"{base}.prof"
+            self.profiler.dump_stats(path)
+        _rotate()
+        return path
+
+
+def _rotate():
+    try:
+        entries = [
+            os.path.join(PROFILE_DIR, name)
+            for name in os.listdir(PROFILE_DIR)
+            if name.endswith((".prof", ".html"))
+        ]
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else entries:
+            os.remove(path)
+    except OSError:
+        traceback.print_exc()
+
+
+def should_profile_request(route, headers):
+    if PROFILE_HEADER_TOKEN and headers.get(PROFILE_HEADER) == PROFILE_HEADER_TOKEN:
+        return True
+    if not PROFILE_ENABLED:
+        return False
+    if PROFILE_ROUTES and route not in PROFILE_ROUTES:
+        return False
+    return random.random() < PROFILE_SAMPLE_RATE
+
+
+def start_capture():
+    if not _active_lock.acquire(blocking=False):
+        return None
+    capture = _Capture()
+    capture.start()
+    return capture
+
+
+def finish_capture(capture, name):
+    try:
+        capture.stop()
+        return capture.save(name)
+    except Exception:
+        traceback.print_exc()
+        return None
+    finally:
+        _active_lock.release()
+
+
+class StageProfile:
+    def __init__(self, name, enabled):
+        self.name = name
+        self.enabled = enabled
+        self._stages = {}
+        self._seconds = {}
+        self._seconds_lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, stage, capture=True, wait=0):
+        if not self.enabled:
+            yield
+            return
+        # Only one capture runs at a time; a busy profiler still leaves the stage timed.
+        acquired = capture and (
+            _active_lock.acquire(timeout=wait) if wait else _active_lock.acquire(False)
+        )
+        started = time.perf_counter()
+        try:
+            if not acquired:
+                yield
+                return
+            profile = self._stages.get(stage)
+            if profile is None:
+                profile = self._stages[stage] = _Capture()
+            profile.start()
+            try:
+                yield
+            finally:
+                profile.stop()
+        finally:
+            if acquired:
+                _active_lock.release()
+            elapsed = time.perf_counter() - started
+            with self._seconds_lock:
+                self._seconds[stage] = self._seconds.get(stage, 0.0) + elapsed
+
+    def wrap(self, stage, fn):
+        # For work handed to another thread (the writer), which a caller-side stage never sees.
+        # Caller-side stages are short, so a brief wait lets most jobs get captured too.
+        if not self.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with self.stage(stage, wait=STAGE_CAPTURE_WAIT):
+                return fn(*args, **kwargs)
+
+        return run
+
+    def seconds(self):
+        with self._seconds_lock:
+            return dict(self._seconds)
+
+    def finish(self):
+        paths = []
+        for stage, capture in self._stages.items():
+            try:
+                paths.append(capture.save(f"{self.name}-{stage}"))
+            except Exception:
+                traceback.print_exc()
+        return paths
+
+
+def ingest_profile(enabled=None):
+    return StageProfile("ingest", PROFILE_INGEST if enabled is None else enabled)
+
+
+def import_breakdown(module, top=15):
+    import subprocess
+    import sys
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    direct = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            direct.append((name.strip(), int(cumulative) / 1000))
+        elif depth == 0:
+            if name.strip() == module:
+                direct.append(("total", int(cumulative) / 1000))
+                break
+            direct = []
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return direct[:top]
@@ -0,0 +1,246 @@
+import argparse
+import math
+import os
+import re
+import time
+from collections import Counter
+
+import db
+
+RELATED_LIMIT = int(os.environ.get("RELATED_LIMIT", 10))
+MAX_RELATED_LIMIT = 50
+QUERY_TERMS = 24
+MIN_QUERY_TERMS = 4
+POSTINGS_BUDGET = int(os.environ.get("RELATED_POSTINGS_BUDGET", 20000))
+MAX_DF_RATIO = 0.5
+# Extra candidates scored so that dropping same-cluster copies still leaves `limit` results.
+CLUSTER_SLACK = 20
+BM25_K1 = 1.2
+BM25_B = 0.75
+REBUILD_BATCH_ROWS = 500
+
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9-]+")
+STOPWORDS = frozenset(
+    """
+    about above after again against all also among and any are around as at based be
+    been before being between both but by can could did does during each either
+    for from further had has have having here how however into its itself may
+    might more most much must near no nor not of off on once only or other our out
+    over per same should since some such than that the their them then there these
+    they this those through thus to too under until upon using very via was were
+    what when where whether which while who whom why will with within without would
+    yet patients patient study studies results conclusions methods background
+    objective objectives aim aims purpose design setting participants outcome outcomes
+    included compared associated among years year months month weeks week days
+    """.split()
+)
+
+
+def tokenize(text):
+    terms = []
+    for token in _TOKEN_PATTERN.findall((text or "").lower()):
+        token = token.strip("-")
+        if len(token) < 3 or token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def document_text(title, abstract, pico=None):
+    parts = [title or "", abstract or ""]
+    for key in ("P", "I", "C", "O"):
+        value = (pico or {}).get(key)
+        if value and value != "UNKNOWN":
+            parts.append(value)
+    return "\n".join(parts)
+
+
+def term_counts(title, abstract, pico=None):
+    return dict(Counter(tokenize(document_text(title, abstract, pico))))
+
+
+def index_article(conn, article_id, counts):
+    if counts is None:
+        return False
+    previous = {}
+    previous_length = 0
+    for row in conn.execute(
+        "SELECT term, tf, length FROM term_postings WHERE article_id = ?", (article_id,)
+    ):
+        previous[row["term"]] = row["tf"]
+        previous_length = row["length"]
+    if previous == counts:
+        return False
+    removed = [term for term in previous if term not in counts]
+    added = [term for term in counts if term not in previous]
+    conn.executemany(
+        "UPDATE term_df SET df = df - 1 WHERE term = ?", [(term,) for term in removed]
+    )
+    conn.executemany(
+        """
+        INSERT INTO term_df (term, df) VALUES (?, 1)
+        ON CONFLICT(term) DO UPDATE SET df = df + 1
+        """,
+        [(term,) for term in added],
+    )
+    if removed:
+        conn.execute("DELETE FROM term_df WHERE df <= 0")
+    # Document length rides along on every posting so scoring needs no extra join.
+    length = sum(counts.values())
+    conn.execute("DELETE FROM term_postings WHERE article_id = ?", (article_id,))
+    conn.executemany(
+        "INSERT INTO term_postings (term, article_id, tf, length) VALUES (?, ?, ?, ?)",
+        [(term, article_id, tf, length) for term, tf in counts.items()],
+    )
+    db.add_meta_counter(conn, "related_docs", (1 if counts else 0) - (1 if previous else 0))
+    db.add_meta_counter(conn, "related_tokens", length - previous_length)
+    return True
+
+
+def _corpus_stats(conn):
+    docs = int(db.get_meta(conn, "related_docs") or 0)
+    tokens = int(db.get_meta(conn, "related_tokens") or 0)
+    return docs, (tokens / docs if docs else 0.0)
+
+
+def _idf(docs, df):
+    return math.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+
+def query_terms(conn, article_id, docs, limit=QUERY_TERMS):
+    weighted = []
+    for row in conn.execute(
+        """
+        SELECT term_postings.term, term_postings.tf, term_df.df
+        FROM term_postings
+        JOIN term_df ON term_df.term = term_postings.term
+        WHERE term_postings.article_id = ?
+        """,
+        (article_id,),
+    ):
+        if row["df"] < 2 or row["df"] > max(2, docs * MAX_DF_RATIO):
+            continue
+        weight = _idf(docs, row["df"]) * (1 + math.log(row["tf"]))
+        weighted.append((weight, row["df"], row["term"]))
+    weighted.sort(reverse=True)
+    # Lookup cost is the postings scanned, so stop adding terms once their df would blow the budget.
+    selected = []
+    scanned = 0
+    for weight, df, term in weighted:
+        if len(selected) >= limit:
+            break
+        if len(selected) >= MIN_QUERY_TERMS and scanned + df > POSTINGS_BUDGET:
+            continue
+        selected.append((term, weight))
+        scanned += df
+    return selected
+
+
+def related_articles(conn, article_id, limit=RELATED_LIMIT):
+    docs, average_length = _corpus_stats(conn)
+    terms = query_terms(conn, article_id, docs)
+    if not terms:
+        return []
+    rows = conn.execute(
+        f"""
+        WITH query(term, weight) AS (VALUES {", ".join(["(?, ?)"] * len(terms))}),
+        scores AS (
+            SELECT term_postings.article_id,
+                SUM(query.weight * term_postings.tf * (? + 1) / (
+                    term_postings.tf + ? * (1 - ? + ? * term_postings.length / ?)
+                )) AS score
+            FROM query
+            JOIN term_postings ON term_postings.term = query.term
+            WHERE term_postings.article_id != ?
+            GROUP BY term_postings.article_id
+            ORDER BY score DESC
+            LIMIT ?
+        )
+        SELECT scores.article_id, scores.score
+        FROM scores
+        JOIN articles ON articles.id = scores.article_id
+        WHERE COALESCE(articles.cluster_id, articles.id) != (
+            SELECT COALESCE(cluster_id, id) FROM articles WHERE id = ?
+        )
+        ORDER BY scores.score DESC, scores.article_id
+        LIMIT ?
+        """,
+        [value for term in terms for value in term]
+        + [BM25_K1, BM25_K1, BM25_B, BM25_B, average_length or 1, article_id]
+        + [limit + CLUSTER_SLACK, article_id, limit],
+    ).fetchall()
+    return [(row["article_id"], round(row["score"], 3)) for row in rows]
+
+
+def _row_counts(row):
+    pico = {key: db.decompress_text(row[f"pico_{key.lower()}"]) for key in ("P", "I", "C", "O")}
+    return term_counts(row["title"], db.decompress_text(row["abstract"]), pico)
+
+
+_SOURCE_QUERY = """
+    SELECT articles.id, articles.title, article_bodies.abstract, article_bodies.pico_p,
+        article_bodies.pico_i, article_bodies.pico_c, article_bodies.pico_o
+    FROM articles
+    LEFT JOIN article_bodies ON article_bodies.article_id = articles.id
+"""
+
+
+def index_missing(conn, progress=None):
+    query = f"{_SOURCE_QUERY} WHERE articles.id NOT IN (SELECT article_id FROM term_postings)"
+    return db.backfill(conn, query, _row_counts, index_article, REBUILD_BATCH_ROWS, progress)
+
+
+def rebuild(conn, progress=None):
+    with db.write_lock():
+        conn.execute("DELETE FROM term_postings")
+        conn.execute("DELETE FROM term_df")
+        conn.execute("DELETE FROM meta WHERE key IN ('related_docs', 'related_tokens')")
+        db.bump_generation(conn)
+        conn.commit()
+        db.publish_data_version(conn)
+    return index_missing(conn, progress)
+
+
+def index_stats(conn):
+    docs, average_length = _corpus_stats(conn)
+    return {
+        "documents": docs,
+        "average_length": round(average_length, 1),
+        "terms": conn.execute("SELECT COUNT(*) FROM term_df").fetchone()[0],
+        "postings": conn.execute("SELECT COUNT(*) FROM term_postings").fetchone()[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Related-article BM25 index.")
+    parser.add_argument(
+        "command",
+        choices=["rebuild", "stats", "query"],
+        help="rebuild: reindex every article; stats: index summary; query: neighbours of --id.",
+    )
+    parser.add_argument("--id", default="", help="Article id for the query command.")
+    parser.add_argument("--limit", type=int, default=RELATED_LIMIT)
+    args = parser.parse_args()
+    db.init_db()
+    conn = db.get_db()
+    if args.command == "rebuild":
+        started = time.perf_counter()
+        done = rebuild(conn, lambda count: print(f"{count} articles", end="\r", flush=True))
+        print(f"\nIndexed {done} articles in {time.perf_counter() - started:.1f}s")
+    if args.command == "query":
+        started = time.perf_counter()
+        results = related_articles(conn, args.id, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        for article_id, score in results:
+            title = conn.execute("SELECT title FROM articles WHERE id = ?", (article_id,)).fetchone()
+            print(f"{score:>8} {article_id} {title['title'] if title else ''}")
+        print(f"{len(results)} related in {elapsed:.1f} ms")
+    else:
+        print(index_stats(conn))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
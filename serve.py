@@ -0,0 +1,168 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import traceback
+from datetime import date
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = object
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+WARM_UP_TITLE = "Randomized trial of dapagliflozin in chronic kidney disease"
+WARM_UP_ABSTRACT = (
+    "Background: Patients with chronic kidney disease (eGFR 25-75) and albuminuria "
+    "were enrolled at 386 centers. Methods: In this randomized, placebo-controlled "
+    "trial, n = 4304 participants received dapagliflozin 10 mg once daily. "
+    "Results: The primary outcome, a composite of sustained decline in eGFR, "
+    "kidney failure, or death, occurred less often with dapagliflozin (hazard ratio "
+    "0.61). Conclusions: Dapagliflozin reduced the risk of kidney outcomes."
+)
+WARM_UP_LIST_PARAMS = "fields=id,title,journal,publish_date,study_type,tags&collapse=1"
+
+
+def default_workers():
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def warm_up():
+    from ai import (
+        detect_outcome_direction,
+        detect_study_type,
+        extract_primary_outcome,
+        impact_assessment,
+        infer_tags,
+        pico_from_text,
+        summarize,
+    )
+    from app import app
+    from db import current_data_version, init_db
+
+    init_db()
+    current_data_version()
+    tags = infer_tags(WARM_UP_TITLE, WARM_UP_ABSTRACT)
+    study_type = detect_study_type(WARM_UP_TITLE, WARM_UP_ABSTRACT)
+    primary_outcome = extract_primary_outcome(WARM_UP_ABSTRACT)
+    direction = detect_outcome_direction(WARM_UP_ABSTRACT)
+    summarize(WARM_UP_TITLE, WARM_UP_ABSTRACT, tags)
+    pico_from_text(WARM_UP_TITLE, WARM_UP_ABSTRACT, tags, primary_outcome)
+    impact_assessment(study_type, direction)
+    client = app.test_client()
+    for url in (
+        "/",
+        "/api/digest",
+        f"/api/articles?date={date.today().isoformat()}&limit=50&{WARM_UP_LIST_PARAMS}",
+        f"/api/articles?limit=50&{WARM_UP_LIST_PARAMS}",
+    ):
+        client.get(url).close()
+
+
+def post_worker_init(worker):
+    try:
+        warm_up()
+    except Exception:
+        traceback.print_exc()
+
+
+def worker_exit(server, worker):
+    import writer
+
+    if not writer.drain(server.cfg.graceful_timeout):
+        server.log.warning("Worker %s exited with database writes still queued", worker.pid)
+
+
+class NephroBrainServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+
+        return app
+
+
+def build_options(args):
+    return {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread" if args.threads > 1 else "sync",
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "keepalive": 5,
+        "accesslog": "-",
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run Nephro Brain with gunicorn (send SIGHUP to reload workers gracefully)."
+    )
+    parser.add_argument("--host", default="0.0.0.0", help="Host to bind.")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.environ.get("PORT", 5000)),
+        help="Port to listen on (defaults to $PORT or 5000).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", 0)) or default_workers(),
+        help="Worker processes (defaults to $WEB_CONCURRENCY or 2 * CPUs + 1).",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=int(os.environ.get("WEB_THREADS", 4)),
+        help="Threads per worker (defaults to $WEB_THREADS or 4).",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=int(os.environ.get("WEB_MAX_REQUESTS", 1000)),
+        help="Recycle a worker after this many requests (0 disables).",
+    )
+    parser.add_argument(
+        "--max-requests-jitter",
+        type=int,
+        default=100,
+        help="Random jitter added to --max-requests so workers do not restart together.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=120,
+        help="Seconds before a silent worker is killed (covers PubMed/OpenAI calls).",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=30,
+        help="Seconds workers get to finish in-flight requests on reload or shutdown.",
+    )
+    args = parser.parse_args()
+    if BaseApplication is object:
+        print("gunicorn is not installed; run `pip install -r requirements.txt`.")
+        sys.exit(1)
+    from compress import precompress_static
+    from db import init_db
+
+    init_db()
+    precompress_static(STATIC_DIR)
+    NephroBrainServer(build_options(args)).run()
+
+
+if __name__ == "__main__":
+    main()
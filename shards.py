@@ -0,0 +1,310 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import db
+from compress import precompress_static
+from serialization import dumps
+
+SHARD_EXPORT = os.environ.get("SHARD_EXPORT", "0") == "1"
+SHARD_BASE_URL = os.environ.get("SHARD_BASE_URL", "").rstrip("/")
+SHARD_GRACE_SECONDS = int(os.environ.get("SHARD_GRACE_SECONDS", 3600))
+SHARD_BATCH_ROWS = 500
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "articles.index"
+SHARD_SUBDIRS = ["days", "months", "articles"]
+LIST_COLUMNS = [
+    "id",
+    "title",
+    "journal",
+    "publish_date",
+    "url",
+    "tags",
+    "tags_mask",
+    "key_takeaway",
+    "study_type",
+    "impact_level",
+    "rank_score",
+]
+DETAIL_COLUMNS = [
+    "id",
+    "title",
+    "journal",
+    "publish_date",
+    "url",
+    "tags",
+    "tags_mask",
+    "key_takeaway",
+    "study_type",
+    "primary_outcome",
+    "outcome_direction",
+    "impact_level",
+    "impact_reason",
+]
+
+
+def shard_dir():
+    return os.environ.get("SHARD_DIR") or f"{db.DB_PATH}.shards"
+
+
+def manifest_url():
+    if SHARD_BASE_URL:
+        return f"{SHARD_BASE_URL}/{MANIFEST_NAME}"
+    return None
+
+
+def _tag_slug(tag):
+    return re.sub(r"[^a-z0-9]+", "-", tag.lower()).strip("-")
+
+
+def _write_shard(directory, stem, payload):
+    body = dumps(payload)
+    relative = f"{stem}-{hashlib.sha256(body).hexdigest()[:16]}.json"
+    path = os.path.join(directory, relative)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as handle:
+            handle.write(body)
+        os.replace(tmp_path, path)
+    return relative
+
+
+def _write_file(path, body):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(body)
+    os.replace(tmp_path, path)
+
+
+def _load_json(path):
+    try:
+        with open(path, "rb") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _load_index(directory):
+    index = _load_json(os.path.join(directory, INDEX_NAME))
+    # Older exports stored bare detail paths, without the day each article was listed under.
+    if not index or not all(isinstance(entry, dict) for entry in index.values()):
+        return None
+    return index
+
+
+def load_manifest(directory=None):
+    return _load_json(os.path.join(directory or shard_dir(), MANIFEST_NAME))
+
+
+def _detail(row):
+    payload = {column: row[column] for column in DETAIL_COLUMNS if column != "tags_mask"}
+    payload["tags"] = db.row_tags(row)
+    for column in db.BODY_COLUMNS:
+        payload[column] = db.decompress_text(row[column])
+    return payload
+
+
+def _render_details(conn, directory, index, ids=None):
+    columns = ", ".join(
+        [f"articles.{column}" for column in DETAIL_COLUMNS]
+        + [f"article_bodies.{column}" for column in db.BODY_COLUMNS]
+    )
+    query = (
+        f"SELECT {columns} FROM articles "
+        "LEFT JOIN article_bodies ON article_bodies.article_id = articles.id"
+    )
+    if ids is None:
+        batches = [conn.execute(query)]
+    else:
+        ids = sorted(ids)
+        chunks = [
+            ids[start : start + SHARD_BATCH_ROWS] for start in range(0, len(ids), SHARD_BATCH_ROWS)
+        ]
+        batches = (
+            conn.execute(f"{query} WHERE articles.id IN ({', '.join(['?'] * len(chunk))})", chunk)
+            for chunk in chunks
+        )
+    rendered = 0
+    for cursor in batches:
+        while True:
+            rows = cursor.fetchmany(SHARD_BATCH_ROWS)
+            if not rows:
+                break
+            for row in rows:
+                index[row["id"]] = {
+                    "detail": _write_shard(directory, f"articles/{row['id']}", _detail(row)),
+                    "day": row["publish_date"],
+                }
+            rendered += len(rows)
+    return rendered
+
+
+def _list_items(conn, where_clauses, params, order, index):
+    collapse_sql, collapse_params = db.collapse_clause(where_clauses, params)
+    columns = ", ".join(f"articles.{column}" for column in LIST_COLUMNS)
+    rows = conn.execute(
+        f"SELECT {columns} FROM articles WHERE {' AND '.join(where_clauses + [collapse_sql])} "
+        f"ORDER BY {order}",
+        params + collapse_params,
+    ).fetchall()
+    items = []
+    for row in rows:
+        item = {column: row[column] for column in LIST_COLUMNS if column != "tags_mask"}
+        item["tags"] = db.row_tags(row)
+        entry = index.get(row["id"])
+        item["detail"] = entry["detail"] if entry else None
+        items.append(item)
+    return items
+
+
+def _render_day(conn, directory, day, index):
+    articles = _list_items(conn, ["publish_date = ?"], [day], "rank_score DESC, id", index)
+    return _write_shard(directory, f"days/{day}", {"day": day, "articles": articles})
+
+
+def _month_bounds(month):
+    start = date.fromisoformat(f"{month}-01")
+    end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+
+def _render_month(conn, directory, month, index):
+    start, end = _month_bounds(month)
+    paths = {}
+    for tag in [db.ALL_TAGS_KEY, *db.TAG_VOCABULARY]:
+        where_clauses = ["publish_date BETWEEN ? AND ?"]
+        params = [start, end]
+        if tag != db.ALL_TAGS_KEY:
+            where_clauses.append("tags_mask & ?")
+            params.append(db.TAG_BITS[tag])
+        articles = _list_items(
+            conn, where_clauses, params, "publish_date DESC, rank_score DESC, id", index
+        )
+        paths[tag] = _write_shard(
+            directory,
+            f"months/{month}-{_tag_slug(tag)}",
+            {"month": month, "tag": tag, "articles": articles},
+        )
+    return paths
+
+
+def _prune(directory, manifest, index):
+    referenced = {entry["detail"] for entry in index.values()}
+    referenced.update(manifest["days"].values())
+    for paths in manifest["months"].values():
+        referenced.update(paths.values())
+    cutoff = time.time() - SHARD_GRACE_SECONDS
+    removed = 0
+    for subdir in SHARD_SUBDIRS:
+        root = os.path.join(directory, subdir)
+        if not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            relative = f"{subdir}/{name}"
+            for suffix in (".gz", ".br"):
+                if relative.endswith(suffix):
+                    relative = relative[: -len(suffix)]
+            if relative in referenced:
+                continue
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def export_shards(directory=None, full=False):
+    directory = directory or shard_dir()
+    os.makedirs(directory, exist_ok=True)
+    previous = None if full else load_manifest(directory)
+    index = _load_index(directory) if previous else None
+    if index is None:
+        previous, index = None, {}
+    conn = db.get_db()
+    try:
+        # One read transaction so every shard and the manifest see the same snapshot.
+        conn.execute("BEGIN")
+        version = db.get_data_version(conn)
+        rendered_through = conn.execute("SELECT MAX(updated_at) FROM articles").fetchone()[0]
+        if previous:
+            changed = conn.execute(
+                "SELECT id, publish_date FROM articles WHERE updated_at > ?",
+                (previous.get("rendered_through") or "",),
+            ).fetchall()
+            # A moved publish_date must also drop the article from the day it was listed under.
+            days = {index[row["id"]]["day"] for row in changed if row["id"] in index}
+            articles = _render_details(conn, directory, index, [row["id"] for row in changed])
+            days.update(row["publish_date"] for row in changed)
+            days.discard(None)
+            manifest_days = dict(previous["days"])
+            manifest_months = dict(previous["months"])
+        else:
+            articles = _render_details(conn, directory, index)
+            days = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT DISTINCT publish_date FROM articles WHERE publish_date IS NOT NULL"
+                )
+            }
+            manifest_days = {}
+            manifest_months = {}
+        for day in days:
+            manifest_days[day] = _render_day(conn, directory, day, index)
+        months = {day[:7] for day in days}
+        for month in months:
+            manifest_months[month] = _render_month(conn, directory, month, index)
+        latest_day = conn.execute("SELECT MAX(publish_date) FROM articles").fetchone()[0]
+    finally:
+        conn.rollback()
+        conn.close()
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "generation": version["generation"],
+        "last_sync": version["last_sync"],
+        "rendered_through": rendered_through,
+        "latest_day": latest_day,
+        "tags": [db.ALL_TAGS_KEY, *db.TAG_VOCABULARY],
+        "days": dict(sorted(manifest_days.items())),
+        "months": dict(sorted(manifest_months.items())),
+    }
+    _write_file(os.path.join(directory, INDEX_NAME), dumps(index))
+    _write_file(os.path.join(directory, MANIFEST_NAME), dumps(manifest))
+    precompress_static(directory)
+    removed = _prune(directory, manifest, index)
+    return {
+        "articles": articles,
+        "days": len(days),
+        "months": len(months),
+        "removed": removed,
+        "path": os.path.join(directory, MANIFEST_NAME),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render static JSON shards for CDN hosting.")
+    parser.add_argument("--output", default="", help="Shard directory (defaults to $SHARD_DIR).")
+    parser.add_argument(
+        "--full", action="store_true", help="Re-render everything instead of changed articles."
+    )
+    args = parser.parse_args()
+    db.init_db()
+    started = time.perf_counter()
+    stats = export_shards(args.output or None, args.full)
+    print(
+        f"Rendered {stats['articles']} articles, {stats['days']} days and "
+        f"{stats['months']} months in {time.perf_counter() - started:.1f}s; "
+        f"removed {stats['removed']} stale files"
+    )
+    print(stats["path"])
+
+
+if __name__ == "__main__":
+    main()
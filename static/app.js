@@ -4,6 +4,8 @@ const state = {
   dateLabel: null,
   selectedTags: [],
   favoritesOnly: false,
+  favoriteArticles: [],
+  relatedArticles: [],
   pagination: {
     mode: "date",
     total: 0,
@@ -33,6 +35,8 @@ const tagOptionsEl = document.getElementById("tag-options");
 const favoritesOnlyEl = document.getElementById("favorites-only");
 const loadMoreBtn = document.getElementById("load-more");
 const exportFavoritesBtn = document.getElementById("export-favorites");
+const rangeExportBtn = document.getElementById("range-export");
+const rangeExportFormatEl = document.getElementById("range-export-format");
 const importFavoritesInput = document.getElementById("import-favorites");
 const favoritesStatusEl = document.getElementById("favorites-status");
 const todayLabelEl = document.getElementById("today-label");
@@ -41,7 +45,15 @@ const syncStatusEl = document.getElementById("sync-status");
 const TAIWAN_TZ = "Asia/Taipei";
 const FAVORITES_KEY = "nephro_brain_favorites";
 const DEFAULT_LIMIT = 50;
-const INCLUDE_ABSTRACT_PARAM = "&include_abstract=0";
+const LIST_FIELDS = ["id", "title", "journal", "publish_date", "study_type", "tags"];
+const LIST_QUERY_PARAMS = `&fields=${LIST_FIELDS.join(",")}&collapse=1`;
+const BATCH_MAX_IDS = 500;
+const PREFETCH_COUNT = 10;
+const ALL_TAGS_KEY = "ALL";
+const RELATED_LIMIT = 5;
+const RELATED_FIELDS = ["id", "title", "journal", "publish_date", "study_type", "url", "tags"];
+let digestUrl = document.querySelector('meta[name="digest-url"]')?.content || "";
+const shardManifestUrl = document.querySelector('meta[name="shard-manifest"]')?.content || "";
 
 const escapeHtml = (text) =>
   (text || "")
@@ -404,6 +416,78 @@ const fetchJson = async (url) => {
   return data;
 };
 
+const fetchDigest = async () => {
+  // The page embeds an immutable digest URL; later loads revalidate through /api/digest.
+  const url = digestUrl || "/api/digest";
+  digestUrl = "";
+  return fetchJson(url);
+};
+
+const digestArticles = (digest, tags) => {
+  const key = tags.length === 1 ? tags[0] : ALL_TAGS_KEY;
+  return (digest.tags[key] || []).map((id) => digest.articles[id]).filter(Boolean);
+};
+
+let shardManifestRequest = null;
+
+const fetchShardManifest = () => {
+  if (!shardManifestUrl) return Promise.resolve(null);
+  if (!shardManifestRequest) {
+    shardManifestRequest = fetchJson(shardManifestUrl).catch((error) => {
+      console.error(error);
+      shardManifestRequest = null;
+      return null;
+    });
+  }
+  return shardManifestRequest;
+};
+
+const shardUrl = (path) =>
+  new URL(path, new URL(shardManifestUrl, window.location.href)).toString();
+
+const filterByTags = (articles, tags) =>
+  tags.length
+    ? articles.filter((article) => article.tags.some((tag) => tags.includes(tag)))
+    : articles;
+
+const fetchDayShard = async (day, tags) => {
+  const manifest = await fetchShardManifest();
+  const path = manifest?.days?.[day];
+  if (!path) return null;
+  const shard = await fetchJson(shardUrl(path));
+  return {
+    articles: filterByTags(shard.articles, tags).slice(0, DEFAULT_LIMIT),
+    date: day,
+    last_sync: manifest.last_sync,
+  };
+};
+
+const fetchLatestDayShard = async (tags) => {
+  const manifest = await fetchShardManifest();
+  return manifest?.latest_day ? fetchDayShard(manifest.latest_day, tags) : null;
+};
+
+const fetchRangeShards = async (startMonth, endMonth, tags) => {
+  const manifest = await fetchShardManifest();
+  if (!manifest) return null;
+  const key = tags.length === 1 ? tags[0] : ALL_TAGS_KEY;
+  const months = Object.keys(manifest.months)
+    .filter((month) => month >= startMonth && month <= endMonth)
+    .sort()
+    .reverse();
+  const shards = await Promise.all(
+    months.map((month) => {
+      const paths = manifest.months[month];
+      return fetchJson(shardUrl(paths[key] || paths[ALL_TAGS_KEY]));
+    })
+  );
+  const items = filterByTags(
+    shards.flatMap((shard) => shard.articles),
+    tags
+  );
+  return { total: items.length, items };
+};
+
 const handleLoadError = (error) => {
   console.error(error);
   const message = error?.message || "載入失敗，請稍後再試。";
@@ -412,9 +496,66 @@ const handleLoadError = (error) => {
 
 const mergeArticleInState = (updated) => {
   if (!updated) return;
-  const index = state.articles.findIndex((item) => item.id === updated.id);
-  if (index === -1) return;
-  state.articles[index] = { ...state.articles[index], ...updated };
+  [state.articles, state.favoriteArticles, state.relatedArticles].forEach((list) => {
+    const index = list.findIndex((item) => item.id === updated.id);
+    if (index === -1) return;
+    list[index] = { ...list[index], ...updated };
+  });
+};
+
+const findArticle = (articleId) =>
+  state.articles.find((item) => item.id === articleId) ||
+  state.favoriteArticles.find((item) => item.id === articleId) ||
+  state.relatedArticles.find((item) => item.id === articleId);
+
+const fetchArticlesBatch = async (ids, fields) => {
+  const results = [];
+  for (let index = 0; index < ids.length; index += BATCH_MAX_IDS) {
+    const body = { ids: ids.slice(index, index + BATCH_MAX_IDS) };
+    if (fields) {
+      body.fields = fields;
+    }
+    const response = await fetch("/api/articles/batch", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(body),
+    });
+    if (!response.ok) {
+      throw new Error("批次查詢失敗，請稍後再試。");
+    }
+    const data = await response.json();
+    results.push(...(data.articles || []));
+  }
+  return results;
+};
+
+const prefetchArticleDetails = async (articles) => {
+  const ids = articles
+    .filter((article) => article.abstract == null && article.id !== state.selectedId)
+    .slice(0, PREFETCH_COUNT)
+    .map((article) => article.id);
+  if (!ids.length) return;
+  try {
+    const details = await fetchArticlesBatch(ids);
+    details.forEach(mergeArticleInState);
+  } catch (error) {
+    console.error(error);
+  }
+};
+
+const loadFavoriteArticles = async () => {
+  const ids = loadFavoriteIds();
+  if (!ids.length) {
+    state.favoriteArticles = [];
+    return;
+  }
+  try {
+    const articles = await fetchArticlesBatch(ids, LIST_FIELDS);
+    state.favoriteArticles = applyFavorites(articles);
+    void prefetchArticleDetails(state.favoriteArticles);
+  } catch (error) {
+    handleLoadError(error);
+  }
 };
 
 const detailFetches = new Map();
@@ -424,9 +565,12 @@ const fetchArticleDetail = async (articleId) => {
   if (detailFetches.has(articleId)) {
     return detailFetches.get(articleId);
   }
+  const detailPath = findArticle(articleId)?.detail;
   const request = (async () => {
     try {
-      const response = await fetch(`/api/articles/${articleId}`);
+      const url =
+        detailPath && shardManifestUrl ? shardUrl(detailPath) : `/api/articles/${articleId}`;
+      const response = await fetch(url);
       if (!response.ok) return null;
       return await response.json();
     } catch (error) {
@@ -440,13 +584,62 @@ const fetchArticleDetail = async (articleId) => {
   return request;
 };
 
+const relatedFetches = new Map();
+
+const fetchRelatedArticles = (articleId) => {
+  if (!relatedFetches.has(articleId)) {
+    const url =
+      `/api/articles/${articleId}/related?limit=${RELATED_LIMIT}` +
+      `&fields=${RELATED_FIELDS.join(",")}`;
+    const request = fetch(url)
+      .then((response) => (response.ok ? response.json() : { items: [] }))
+      .then((data) => data.items || [])
+      .catch((error) => {
+        console.error(error);
+        relatedFetches.delete(articleId);
+        return [];
+      });
+    relatedFetches.set(articleId, request);
+  }
+  return relatedFetches.get(articleId);
+};
+
+const renderRelated = async (articleId) => {
+  const items = await fetchRelatedArticles(articleId);
+  const relatedEl = document.getElementById("related-list");
+  if (!relatedEl || state.selectedId !== articleId) return;
+  if (!items.length) {
+    relatedEl.innerHTML = `<p class="muted">沒有相關文章。</p>`;
+    return;
+  }
+  relatedEl.innerHTML = "";
+  items.forEach((item) => {
+    const entry = document.createElement("button");
+    entry.className = "related-item";
+    entry.innerHTML = `
+      <span class="related-title">${escapeHtml(item.title)}</span>
+      <span class="article-meta">
+        <span class="meta-journal">${escapeHtml(item.journal)}</span>
+        <span>${escapeHtml(item.publish_date)}</span>
+      </span>
+    `;
+    entry.addEventListener("click", () => {
+      if (!findArticle(item.id)) {
+        state.relatedArticles.push(...applyFavorites([{ ...item }]));
+      }
+      void selectArticle(item.id, true);
+    });
+    relatedEl.appendChild(entry);
+  });
+};
+
 const selectArticle = async (articleId, shouldScroll = false) => {
   state.selectedId = articleId;
   if (!articleId) {
     renderDetail();
     return;
   }
-  const article = state.articles.find((item) => item.id === articleId);
+  const article = findArticle(articleId);
   if (!article) {
     renderDetail();
     return;
@@ -500,7 +693,7 @@ const renderList = () => {
   listEl.innerHTML = "";
   let articles = state.articles;
   if (state.favoritesOnly) {
-    articles = articles.filter((article) => article.favorite);
+    articles = state.favoriteArticles.filter((article) => article.favorite);
   }
   if (state.pagination.mode === "range") {
     resultCountEl.textContent = `${articles.length} / ${state.pagination.total} 篇`;
@@ -545,7 +738,7 @@ const renderList = () => {
 };
 
 const renderDetail = () => {
-  const article = state.articles.find((item) => item.id === state.selectedId);
+  const article = findArticle(state.selectedId);
   if (!article) {
     detailEl.innerHTML = `
       <div class="empty-state">
@@ -599,12 +792,22 @@ const renderDetail = () => {
       `
       }
     </div>
+    <div class="section">
+      <h3>相關文章</h3>
+      <div class="related-list" id="related-list">
+        <p class="muted">載入中...</p>
+      </div>
+    </div>
   `;
+  void renderRelated(article.id);
 
   const favoriteBtn = document.getElementById("favorite-btn");
   favoriteBtn.addEventListener("click", (event) => {
     event.stopPropagation();
     article.favorite = toggleFavorite(article.id);
+    applyFavorites(state.articles);
+    applyFavorites(state.favoriteArticles);
+    applyFavorites(state.relatedArticles);
     render();
   });
 
@@ -769,9 +972,11 @@ const loadArticlesForDate = async (dateValue) => {
   }
   const tags = getSelectedTags();
   const tagParam = buildTagParam(tags);
-  const data = await fetchJson(
-    `/api/articles?date=${dateValue}&limit=${DEFAULT_LIMIT}${tagParam}${INCLUDE_ABSTRACT_PARAM}`
-  );
+  const data =
+    (await fetchDayShard(dateValue, tags).catch(() => null)) ||
+    (await fetchJson(
+      `/api/articles?date=${dateValue}&limit=${DEFAULT_LIMIT}${tagParam}${LIST_QUERY_PARAMS}`
+    ));
   state.articles = applyFavorites(data.articles);
   state.dateLabel = dateValue;
   state.selectedId = state.articles[0] ? state.articles[0].id : null;
@@ -796,6 +1001,7 @@ const loadArticlesForDate = async (dateValue) => {
   }
   updateLoadMoreVisibility();
   render();
+  void prefetchArticleDetails(state.articles);
 };
 
 const loadArticlesForRange = async (startMonth, endMonth) => {
@@ -807,26 +1013,31 @@ const loadArticlesForRange = async (startMonth, endMonth) => {
   setRangeStatus("");
   const tags = getSelectedTags();
   const tagParam = buildTagParam(tags);
-  const response = await fetch(
-    `/api/articles/range?start=${startMonth}&end=${endMonth}&limit=${DEFAULT_LIMIT}&offset=0${tagParam}${INCLUDE_ABSTRACT_PARAM}`
-  );
-  if (!response.ok) {
-    try {
-      const errorData = await response.json();
-      setRangeStatus(errorData.error || "區間查詢失敗，請確認日期。");
-    } catch (error) {
-      setRangeStatus("區間查詢失敗，請確認日期。");
+  // Month shards hold the whole selection, so there is nothing left to page through.
+  let data = await fetchRangeShards(startMonth, endMonth, tags).catch(() => null);
+  const limit = data ? Math.max(data.items.length, DEFAULT_LIMIT) : DEFAULT_LIMIT;
+  if (!data) {
+    const response = await fetch(
+      `/api/articles/range?start=${startMonth}&end=${endMonth}&limit=${DEFAULT_LIMIT}&offset=0${tagParam}${LIST_QUERY_PARAMS}`
+    );
+    if (!response.ok) {
+      try {
+        const errorData = await response.json();
+        setRangeStatus(errorData.error || "區間查詢失敗，請確認日期。");
+      } catch (error) {
+        setRangeStatus("區間查詢失敗，請確認日期。");
+      }
+      return;
     }
-    return;
+    data = await response.json();
   }
-  const data = await response.json();
   state.articles = applyFavorites(data.items);
   state.dateLabel = endMonth;
   state.selectedId = state.articles[0] ? state.articles[0].id : null;
   state.pagination = {
     mode: "range",
     total: data.total,
-    limit: DEFAULT_LIMIT,
+    limit,
     offset: 0,
     start: startMonth,
     end: endMonth,
@@ -838,6 +1049,7 @@ const loadArticlesForRange = async (startMonth, endMonth) => {
   render();
   updateLoadMoreVisibility();
   setRangeStatus(data.items.length ? "" : "該區間沒有文章。");
+  void prefetchArticleDetails(state.articles);
 };
 
 const loadArticles = async (statusOverride) => {
@@ -846,13 +1058,31 @@ const loadArticles = async (statusOverride) => {
   const tags = state.pagination.tags || [];
   const tagParam = buildTagParam(tags);
   try {
-    let data = await fetchJson(
-      `/api/articles?date=${today}&limit=${DEFAULT_LIMIT}${tagParam}${INCLUDE_ABSTRACT_PARAM}`
-    );
+    let data = null;
+    if (tags.length <= 1) {
+      const digest = await fetchDigest().catch((error) => {
+        console.error(error);
+        return null;
+      });
+      const articles = digest ? digestArticles(digest, tags) : [];
+      if (articles.length) {
+        data = { articles, date: digest.day, last_sync: digest.last_sync };
+        if (!statusOverride && !articles.some((article) => article.publish_date === today)) {
+          statusText = "今日無新文章，已顯示近期精選。";
+        }
+      }
+    }
+    if (!data) {
+      data =
+        (await fetchDayShard(today, tags).catch(() => null)) ||
+        (await fetchJson(
+          `/api/articles?date=${today}&limit=${DEFAULT_LIMIT}${tagParam}${LIST_QUERY_PARAMS}`
+        ));
+    }
     if (!data.articles.length) {
-      data = await fetchJson(
-        `/api/articles?limit=${DEFAULT_LIMIT}${tagParam}${INCLUDE_ABSTRACT_PARAM}`
-      );
+      data =
+        (await fetchLatestDayShard(tags).catch(() => null)) ||
+        (await fetchJson(`/api/articles?limit=${DEFAULT_LIMIT}${tagParam}${LIST_QUERY_PARAMS}`));
       if (!statusOverride) {
         if (data.articles.length) {
           statusText = "今日無新文章，已顯示最新日期。";
@@ -885,6 +1115,7 @@ const loadArticles = async (statusOverride) => {
     updateSyncInfo(data.last_sync, statusText);
     updateLoadMoreVisibility();
     render();
+    void prefetchArticleDetails(state.articles);
   } catch (error) {
     state.articles = [];
     state.selectedId = null;
@@ -904,7 +1135,7 @@ const loadMoreRange = async () => {
   const tagParam = buildTagParam(tags);
   const response = await fetch(
     `/api/articles/range?start=${state.pagination.start}&end=${state.pagination.end}` +
-      `&limit=${state.pagination.limit}&offset=${nextOffset}${tagParam}${INCLUDE_ABSTRACT_PARAM}`
+      `&limit=${state.pagination.limit}&offset=${nextOffset}${tagParam}${LIST_QUERY_PARAMS}`
   );
   if (!response.ok) {
     setRangeStatus("載入更多失敗，請稍後再試。");
@@ -925,6 +1156,7 @@ if (refreshBtn) {
     let handled = false;
     try {
       const response = await fetch("/api/refresh", { method: "POST" });
+      shardManifestRequest = null;
       const data = await response.json();
       if (data.stored === 0) {
         await loadArticles("今日無新文章，已顯示最新日期。");
@@ -953,8 +1185,11 @@ if (tagOptionsEl) {
 }
 
 if (favoritesOnlyEl) {
-  favoritesOnlyEl.addEventListener("change", () => {
+  favoritesOnlyEl.addEventListener("change", async () => {
     state.favoritesOnly = favoritesOnlyEl.checked;
+    if (state.favoritesOnly) {
+      await loadFavoriteArticles();
+    }
     render();
   });
 }
@@ -1031,6 +1266,7 @@ if (rangeSearchBtn) {
         return;
       }
       setRangeStatus("匯入完成，正在載入...");
+      shardManifestRequest = null;
       await loadArticlesForRange(startDate, endDate);
     } catch (error) {
       console.error(error);
@@ -1042,6 +1278,28 @@ if (rangeSearchBtn) {
   });
 }
 
+if (rangeExportBtn) {
+  rangeExportBtn.addEventListener("click", () => {
+    const startDate = rangeStartEl.value;
+    const endDate = rangeEndEl.value;
+    const validation = validateMonthRange(startDate, endDate);
+    if (!validation.ok) {
+      setRangeStatus(validation.message);
+      return;
+    }
+    const params = new URLSearchParams({
+      format: rangeExportFormatEl ? rangeExportFormatEl.value : "ris",
+      start: startDate,
+      end: endDate,
+      collapse: "1",
+    });
+    if (state.selectedTags.length) {
+      params.set("tags", state.selectedTags.join(","));
+    }
+    window.location.href = `/api/export?${params.toString()}`;
+  });
+}
+
 if (loadMoreBtn) {
   loadMoreBtn.addEventListener("click", async () => {
     loadMoreBtn.disabled = true;
@@ -1100,6 +1358,9 @@ if (importFavoritesInput) {
           saveFavoriteIds(Array.from(merged));
         }
         applyFavorites(state.articles);
+        if (state.favoritesOnly) {
+          void loadFavoriteArticles().then(render);
+        }
         render();
         setFavoritesStatus("收藏已匯入");
       } catch (error) {
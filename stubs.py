@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+STUB_IDS_PER_DAY = 3
+STUB_ID_BASE = 70000000
+STUB_JOURNAL = "Kidney International"
+STUB_TOPICS = [
+    "dapagliflozin in chronic kidney disease",
+    "finerenone and albuminuria",
+    "hyperkalemia management in hemodialysis",
+    "peritoneal dialysis catheter outcomes",
+    "acute kidney injury after cardiac surgery",
+    "IgA nephropathy progression",
+    "kidney transplant rejection biomarkers",
+    "lupus nephritis induction therapy",
+]
+STUB_SUMMARY = (
+    "【研究類型】A Clinical trial / interventional study\n"
+    "重點結論：介入組的主要腎臟結局事件較少。\n"
+    "P：慢性腎臟病成人\n"
+    "I：SGLT2 抑制劑\n"
+    "C：安慰劑\n"
+    "O：eGFR 持續下降、腎衰竭或死亡"
+)
+
+
+def stub_ids(start, end):
+    ids = []
+    day = start
+    while day <= end:
+        ordinal = day.toordinal()
+        ids.extend(str(STUB_ID_BASE + ordinal * 10 + index) for index in range(STUB_IDS_PER_DAY))
+        day += timedelta(days=1)
+    return ids
+
+
+def _parse_pubmed_date(value):
+    year, month, day = (int(part) for part in value.split("/"))
+    return date(year, month, day)
+
+
+def pubmed_article_xml(pmid):
+    ordinal, index = divmod(int(pmid) - STUB_ID_BASE, 10)
+    published = date.fromordinal(ordinal) if ordinal > 0 else date.today()
+    rng = random.Random(int(hashlib.sha1(pmid.encode()).hexdigest()[:8], 16))
+    topic = STUB_TOPICS[(ordinal + index) % len(STUB_TOPICS)]
+    participants = rng.randint(80, 5000)
+    sections = [
+        ("BACKGROUND", f"The effect of {escape(topic)} is uncertain."),
+        (
+            "METHODS",
+            f"In this randomized trial, n = {participants} adults were assigned "
+            "to the intervention or placebo.",
+        ),
+        (
+            "RESULTS",
+            "The primary outcome occurred less often in the intervention group "
+            f"(hazard ratio 0.{rng.randint(50, 95)}).",
+        ),
+        ("CONCLUSIONS", "The intervention reduced kidney outcomes."),
+    ]
+    abstract = "".join(
+        f'<AbstractText Label="{label}">{text}</AbstractText>' for label, text in sections
+    )
+    return (
+        "<PubmedArticle><MedlineCitation>"
+        f"<PMID>{pmid}</PMID><Article><Journal><JournalIssue><PubDate>"
+        f"<Year>{published.year}</Year><Month>{published.strftime('%b')}</Month>"
+        f"<Day>{published.day:02d}</Day>"
+        f"</PubDate></JournalIssue><Title>{STUB_JOURNAL}</Title></Journal>"
+        f"<ArticleTitle>Randomized trial of {escape(topic)} ({pmid})</ArticleTitle>"
+        f"<Abstract>{abstract}</Abstract>"
+        "</Article></MedlineCitation></PubmedArticle>"
+    )
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        if self.latency:
+            time.sleep(self.latency)
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class PubMedHandler(_StubHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path.endswith("/esearch.fcgi"):
+            ids = stub_ids(
+                _parse_pubmed_date(params["mindate"]), _parse_pubmed_date(params["maxdate"])
+            )
+            retstart = int(params.get("retstart", 0))
+            retmax = int(params.get("retmax", 20))
+            page = ids[retstart : retstart + retmax]
+            body = (
+                f"<eSearchResult><Count>{len(ids)}</Count><IdList>"
+                + "".join(f"<Id>{pmid}</Id>" for pmid in page)
+                + "</IdList></eSearchResult>"
+            )
+            self._send(200, body, "text/xml")
+        elif url.path.endswith("/efetch.fcgi"):
+            ids = [pmid for pmid in params.get("id", "").split(",") if pmid]
+            body = (
+                "<PubmedArticleSet>"
+                + "".join(pubmed_article_xml(pmid) for pmid in ids)
+                + "</PubmedArticleSet>"
+            )
+            self._send(200, body, "text/xml")
+        else:
+            self._send(404, "not found", "text/plain")
+
+
+class OpenAIHandler(_StubHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        body = json.dumps(
+            {"choices": [{"message": {"role": "assistant", "content": STUB_SUMMARY}}]},
+            ensure_ascii=False,
+        )
+        self._send(200, body, "application/json")
+
+
+def start_stub(handler, latency_ms=0, host="127.0.0.1", port=0):
+    handler_class = type(handler.__name__, (handler,), {"latency": latency_ms / 1000})
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local PubMed and OpenAI stand-ins.")
+    parser.add_argument("--pubmed-port", type=int, default=8701, help="PubMed stub port.")
+    parser.add_argument("--openai-port", type=int, default=8702, help="OpenAI stub port.")
+    parser.add_argument("--pubmed-latency-ms", type=float, default=200, help="PubMed delay.")
+    parser.add_argument("--openai-latency-ms", type=float, default=1500, help="OpenAI delay.")
+    args = parser.parse_args()
+    _, pubmed_url = start_stub(PubMedHandler, args.pubmed_latency_ms, port=args.pubmed_port)
+    _, openai_url = start_stub(OpenAIHandler, args.openai_latency_ms, port=args.openai_port)
+    print(f"PUBMED_BASE_URL={pubmed_url}")
+    print(f"OPENAI_API_URL={openai_url}/v1/chat/completions")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+import argparse
+import gzip
+import json
+import math
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from xml.sax.saxutils import escape
+
+import db
+import dedupe
+import related
+from ai import (
+    detect_outcome_direction,
+    detect_study_type,
+    extract_primary_outcome,
+    impact_assessment,
+    infer_tags,
+    pico_from_text,
+    summarize,
+)
+from ingest import DEFAULT_JOURNALS
+
+DEFAULT_ID_START = 90000000
+DEFAULT_END = date(2025, 12, 31)
+XML_FILE_ARTICLES = 10000
+INSERT_BATCH_ROWS = 5000
+ABSTRACT_MEDIAN_CHARS = 1600
+ABSTRACT_SIGMA = 0.35
+STRUCTURED_SHARE = 0.8
+UNTAGGED_SHARE = 0.15
+
+DESIGNS = [
+    ("randomized", 0.22),
+    ("cohort", 0.30),
+    ("meta-analysis", 0.10),
+    ("case-control", 0.06),
+    ("cross-sectional", 0.12),
+    ("guideline", 0.03),
+    ("observational", 0.17),
+]
+DESIGN_PHRASES = {
+    "randomized": "In this multicenter randomized, placebo-controlled trial",
+    "cohort": "In this prospective cohort study",
+    "meta-analysis": "In this systematic review and meta-analysis",
+    "case-control": "In this case-control study",
+    "cross-sectional": "In this cross-sectional study",
+    "guideline": "This clinical practice guideline",
+    "observational": "In this observational study",
+}
+INTERVENTIONS = [
+    "dapagliflozin", "empagliflozin", "finerenone", "semaglutide", "patiromer",
+    "sodium zirconium cyclosilicate", "tacrolimus", "belimumab", "sparsentan",
+    "hemodiafiltration", "incremental peritoneal dialysis", "intensive blood pressure control",
+]
+COMPARATORS = ["placebo", "usual care", "standard therapy", "no treatment", "conventional hemodialysis"]
+OUTCOMES = [
+    "sustained 40% decline in eGFR, kidney failure, or death",
+    "incident acute kidney injury",
+    "all-cause mortality",
+    "change in urine albumin-to-creatinine ratio",
+    "biopsy-proven acute rejection",
+    "serum potassium above 5.5 mmol/L",
+    "complete renal remission",
+    "technique failure",
+]
+DIRECTIONS = [
+    ("reduced", 0.45),
+    ("increased", 0.15),
+    ("showed no significant difference in", 0.40),
+]
+FILLER_SENTENCES = [
+    "Baseline characteristics were balanced between groups.",
+    "Adverse events were similar across treatment arms.",
+    "Sensitivity analyses yielded consistent estimates.",
+    "Missing data were handled with multiple imputation.",
+    "Subgroup analyses by diabetes status showed no heterogeneity.",
+    "Median follow-up was {months} months.",
+    "Participants were recruited from {centers} centers in {countries} countries.",
+    "Outcomes were adjudicated by a blinded committee.",
+    "The mean age was {age} years and {women}% were women.",
+    "Mean eGFR at baseline was {egfr} mL/min/1.73 m2.",
+    "Event rates were {rate} per 100 patient-years.",
+    "Results were robust after adjustment for baseline albuminuria and blood pressure.",
+    "Discontinuation rates did not differ between groups.",
+    "Serious infections occurred in {infections}% of participants.",
+    "Data were analyzed from {year} through {last_year}.",
+    "Cost-effectiveness was estimated with a Markov model.",
+]
+TOPIC_PHRASES = {
+    "CKD": ["chronic kidney disease", "CKD stage 3-4", "albuminuria", "reduced eGFR"],
+    "AKI": ["acute kidney injury", "AKI after cardiac surgery", "sepsis-associated AKI"],
+    "HD": ["maintenance hemodialysis", "haemodialysis", "in-center hemodialysis"],
+    "PD": ["peritoneal dialysis", "PD catheter complications"],
+    "Transplant": ["kidney transplant recipients", "renal transplant", "allograft dysfunction"],
+    "Electrolyte disorders": ["hyperkalemia", "hyponatremia", "hypokalemia"],
+    "GN / IgA / Lupus": ["IgA nephropathy", "lupus nephritis", "membranous glomerulopathy"],
+}
+JOURNAL_VOLUME = {
+    "Nephrology Dialysis Transplantation": 14,
+    "Kidney International Reports": 13,
+    "Clinical Kidney Journal": 11,
+    "American Journal of Kidney Diseases": 10,
+    "Journal of Nephrology": 9,
+    "Kidney International": 9,
+    "Journal of the American Society of Nephrology": 8,
+    "Clinical Journal of the American Society of Nephrology": 8,
+    "American Journal of Nephrology": 7,
+    "Current Opinion in Nephrology and Hypertension": 4,
+    "Seminars in Nephrology": 3,
+    "Advances in Chronic Kidney Disease": 3,
+    "Nature Reviews Nephrology": 2,
+    "New England Journal of Medicine": 1,
+}
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def _weighted(rng, choices):
+    roll = rng.random() * sum(weight for _, weight in choices)
+    for value, weight in choices:
+        roll -= weight
+        if roll <= 0:
+            return value
+    return choices[-1][0]
+
+
+JOURNAL_WEIGHTS = [(journal, JOURNAL_VOLUME.get(journal, 0)) for journal in DEFAULT_JOURNALS]
+
+
+def _publish_date(rng, start, end):
+    span = (end - start).days
+    offset = int(span * math.sqrt(rng.random()))
+    return start + timedelta(days=offset)
+
+
+def _topics(rng):
+    if rng.random() < UNTAGGED_SHARE:
+        return []
+    count = 1 if rng.random() < 0.6 else 2 if rng.random() < 0.8 else 3
+    return rng.sample(list(TOPIC_PHRASES), count)
+
+
+def _sections(rng, design, keywords, intervention, target_chars):
+    comparator = rng.choice(COMPARATORS)
+    outcome = rng.choice(OUTCOMES)
+    direction = _weighted(rng, DIRECTIONS)
+    participants = int(rng.lognormvariate(6.5, 1.2)) + 20
+    background = (
+        f"The role of {intervention} in patients with {', '.join(keywords)} remains uncertain."
+    )
+    methods = (
+        f"{DESIGN_PHRASES[design]}, n = {participants} adults with {keywords[0]} "
+        f"received {intervention} or {comparator}. "
+        f"The primary outcome was {outcome}."
+    )
+    ratio = rng.uniform(0.55, 1.3)
+    results = (
+        f"Over follow-up, {intervention} {direction} the risk of {outcome} "
+        f"(hazard ratio {ratio:.2f}; 95% CI {ratio * 0.8:.2f}-{ratio * 1.2:.2f})."
+    )
+    conclusions = f"Among patients with {keywords[0]}, {intervention} {direction} {outcome}."
+    sections = [
+        ["BACKGROUND", background],
+        ["METHODS", methods],
+        ["RESULTS", results],
+        ["CONCLUSIONS", conclusions],
+    ]
+    length = sum(len(text) for _, text in sections)
+    deck = []
+    while length < target_chars:
+        if not deck:
+            deck = FILLER_SENTENCES[:]
+            rng.shuffle(deck)
+        filler = deck.pop().format(
+            months=rng.randint(6, 60),
+            centers=rng.randint(1, 400),
+            countries=rng.randint(1, 40),
+            age=rng.randint(38, 74),
+            women=rng.randint(25, 60),
+            egfr=rng.randint(18, 75),
+            rate=round(rng.uniform(0.5, 18), 1),
+            infections=rng.randint(1, 12),
+            year=rng.randint(2005, 2018),
+            last_year=rng.randint(2019, 2024),
+        )
+        section = sections[rng.choice([1, 2, 2])]
+        section[1] += " " + filler
+        length += len(filler) + 1
+    return sections
+
+
+def generate_article(seed, index, start, end, id_start=DEFAULT_ID_START):
+    rng = random.Random(seed * 1000003 + index)
+    design = _weighted(rng, DESIGNS)
+    keywords = [rng.choice(TOPIC_PHRASES[topic]) for topic in _topics(rng)] or ["kidney disease"]
+    intervention = rng.choice(INTERVENTIONS)
+    target_chars = int(ABSTRACT_MEDIAN_CHARS * rng.lognormvariate(0, ABSTRACT_SIGMA))
+    sections = _sections(rng, design, keywords, intervention, target_chars)
+    structured = rng.random() < STRUCTURED_SHARE
+    subject = rng.choice(OUTCOMES).split(",")[0]
+    label = {
+        "randomized": "a randomized trial",
+        "meta-analysis": "a systematic review and meta-analysis",
+        "guideline": "clinical practice guideline",
+        "observational": "an observational study",
+    }.get(design, f"a {design} study")
+    return {
+        "id": str(id_start + index),
+        "title": f"{intervention[0].upper()}{intervention[1:]} and {subject} "
+        f"in {rng.choice(keywords)}: {label}",
+        "journal": _weighted(rng, JOURNAL_WEIGHTS),
+        "publish_date": _publish_date(rng, start, end).isoformat(),
+        "sections": sections if structured else [[None, " ".join(text for _, text in sections)]],
+    }
+
+
+def abstract_text(article):
+    parts = []
+    for label, text in article["sections"]:
+        parts.append(f"{label.title()}: {text}" if label else text)
+    return "\n\n".join(parts)
+
+
+def article_xml(article):
+    year, month, day = article["publish_date"].split("-")
+    abstract = "".join(
+        f'<AbstractText Label="{label}">{escape(text)}</AbstractText>'
+        if label
+        else f"<AbstractText>{escape(text)}</AbstractText>"
+        for label, text in article["sections"]
+    )
+    return (
+        "<PubmedArticle><MedlineCitation>"
+        f"<PMID>{article['id']}</PMID><Article><Journal><JournalIssue><PubDate>"
+        f"<Year>{year}</Year><Month>{MONTHS[int(month) - 1]}</Month><Day>{day}</Day>"
+        f"</PubDate></JournalIssue><Title>{escape(article['journal'])}</Title></Journal>"
+        f"<ArticleTitle>{escape(article['title'])}</ArticleTitle>"
+        f"<Abstract>{abstract}</Abstract>"
+        "</Article></MedlineCitation></PubmedArticle>"
+    )
+
+
+def iter_articles(count, seed=1, start=None, end=None, id_start=DEFAULT_ID_START):
+    end = end or DEFAULT_END
+    start = start or end - timedelta(days=365 * 5)
+    for index in range(count):
+        yield generate_article(seed, index, start, end, id_start)
+
+
+def write_xml(directory, articles, per_file=XML_FILE_ARTICLES, compress=False):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    handle = None
+    written = 0
+    try:
+        for article in articles:
+            if written % per_file == 0:
+                if handle is not None:
+                    handle.write("</PubmedArticleSet>\n")
+                    handle.close()
+                name = f"efetch-{written // per_file:05d}.xml" + (".gz" if compress else "")
+                path = os.path.join(directory, name)
+                opener = gzip.open if compress else open
+                handle = opener(path, "wt", encoding="utf-8")
+                handle.write('<?xml version="1.0" ?>\n<PubmedArticleSet>\n')
+                paths.append(path)
+            handle.write(article_xml(article))
+            handle.write("\n")
+            written += 1
+    finally:
+        if handle is not None:
+            handle.write("</PubmedArticleSet>\n")
+            handle.close()
+    return paths
+
+
+def enrich(article, heuristics=True):
+    abstract = abstract_text(article)
+    tags = infer_tags(article["title"], abstract)
+    if heuristics:
+        summary = summarize(article["title"], abstract, tags)
+        pico = pico_from_text(article["title"], abstract, tags, summary["primary_outcome"])
+    else:
+        summary = {
+            "key_takeaway": article["sections"][-1][1],
+            "study_type": detect_study_type(article["title"], abstract),
+            "primary_outcome": extract_primary_outcome(abstract),
+            "outcome_direction": detect_outcome_direction(abstract),
+        }
+        pico = {"P": "UNKNOWN", "I": "UNKNOWN", "C": "UNKNOWN", "O": summary["primary_outcome"]}
+    impact = impact_assessment(summary["study_type"], summary["outcome_direction"])
+    return abstract, tags, summary, pico, impact
+
+
+def _flush(conn, hot_rows, body_rows):
+    placeholders = ", ".join(["?"] * len(db.HOT_COLUMNS))
+    conn.executemany(
+        f"INSERT OR REPLACE INTO articles ({', '.join(db.HOT_COLUMNS)}) VALUES ({placeholders})",
+        hot_rows,
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO article_bodies "
+        f"(article_id, {', '.join(db.BODY_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+        body_rows,
+    )
+    hot_rows.clear()
+    body_rows.clear()
+
+
+def build_database(path, articles, heuristics=True, progress=None, index=True):
+    previous_path = db.DB_PATH
+    db.DB_PATH = path
+    try:
+        # A synthetic corpus is exactly what was generated, without the seed snapshot rows.
+        db.init_db(seed=False)
+        conn = db.get_db()
+        now = datetime.utcnow().isoformat()
+        hot_rows = []
+        body_rows = []
+        count = 0
+        for article in articles:
+            abstract, tags, summary, pico, impact = enrich(article, heuristics)
+            hot_rows.append(
+                (
+                    article["id"],
+                    article["title"],
+                    article["journal"],
+                    article["publish_date"],
+                    f"https://pubmed.ncbi.nlm.nih.gov/{article['id']}/",
+                    json.dumps(tags),
+                    db.tags_to_mask(tags),
+                    summary["key_takeaway"],
+                    summary["study_type"],
+                    summary["primary_outcome"],
+                    summary["outcome_direction"],
+                    impact["level"],
+                    impact["reason"],
+                    now,
+                    now,
+                )
+            )
+            body_rows.append(
+                (
+                    article["id"],
+                    db.compress_text(abstract),
+                    db.compress_text(pico["P"]),
+                    db.compress_text(pico["I"]),
+                    db.compress_text(pico["C"]),
+                    db.compress_text(pico["O"]),
+                )
+            )
+            count += 1
+            if len(hot_rows) >= INSERT_BATCH_ROWS:
+                _flush(conn, hot_rows, body_rows)
+                if progress:
+                    progress(count)
+        _flush(conn, hot_rows, body_rows)
+        db.update_rank_scores(conn)
+        db.rebuild_daily_tag_counts(conn)
+        with db.write_lock():
+            db.bump_generation(conn)
+            conn.commit()
+            db.publish_data_version(conn)
+        if index:
+            dedupe.rebuild(conn)
+            related.rebuild(conn)
+        conn.close()
+        return count
+    finally:
+        db.DB_PATH = previous_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic PubMed corpus.")
+    parser.add_argument("format", choices=["xml", "sqlite"], help="Output kind.")
+    parser.add_argument("output", help="Directory for xml, database path for sqlite.")
+    parser.add_argument("--count", type=int, default=100000, help="Number of articles.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (same seed, same corpus).")
+    parser.add_argument("--start", default="", help="First publish date (YYYY-MM-DD).")
+    parser.add_argument("--end", default="", help=f"Last publish date (defaults to {DEFAULT_END}).")
+    parser.add_argument("--id-start", type=int, default=DEFAULT_ID_START, help="First PMID.")
+    parser.add_argument("--per-file", type=int, default=XML_FILE_ARTICLES, help="XML per file.")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the XML files.")
+    parser.add_argument(
+        "--no-heuristics",
+        action="store_true",
+        help="Skip summarize/PICO when building a database (much faster at 10^6 rows).",
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Skip near-duplicate clustering and the related-article index (about 6 ms/article).",
+    )
+    args = parser.parse_args()
+    start = date.fromisoformat(args.start) if args.start else None
+    end = date.fromisoformat(args.end) if args.end else None
+    articles = iter_articles(args.count, args.seed, start, end, args.id_start)
+    started = time.perf_counter()
+    if args.format == "xml":
+        paths = write_xml(args.output, articles, args.per_file, args.gzip)
+        print(f"Wrote {args.count} articles to {len(paths)} files in {args.output}")
+    else:
+        count = build_database(
+            args.output,
+            articles,
+            heuristics=not args.no_heuristics,
+            index=not args.no_index,
+            progress=lambda done: print(f"{done} articles", end="\r", flush=True),
+        )
+        print()
+        print(f"Wrote {count} articles to {args.output}")
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+import db
+import metrics
+
+WRITER_BATCH_SIZE = int(os.environ.get("WRITER_BATCH_SIZE", 64))
+WRITER_BATCH_WINDOW = float(os.environ.get("WRITER_BATCH_WINDOW_MS", 2)) / 1000
+
+
+def _noop(conn):
+    return None
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future", "enqueued_at")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class DatabaseWriter:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._commit_hooks = []
+        self._stats = {
+            "jobs": 0,
+            "failed_jobs": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "max_batch_size": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "commit_seconds_total": 0.0,
+        }
+
+    def submit(self, fn, *args, **kwargs):
+        self._ensure_started()
+        job = _Job(fn, args, kwargs)
+        self._queue.put(job)
+        return job.future
+
+    def call(self, fn, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    def drain(self, timeout=None):
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return True
+        try:
+            self.submit(_noop).result(timeout)
+        except Exception:
+            return False
+        return True
+
+    def add_commit_hook(self, hook):
+        self._commit_hooks.append(hook)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["wait_seconds_avg"] = (
+            stats["wait_seconds_total"] / stats["jobs"] if stats["jobs"] else 0.0
+        )
+        return stats
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run, name="nephro-db-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + WRITER_BATCH_WINDOW
+        while len(batch) < WRITER_BATCH_SIZE:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        db.init_db()
+        conn = db.get_db()
+        conn.isolation_level = None
+        while True:
+            batch = self._next_batch()
+            self._run_batch(conn, batch)
+
+    def _run_batch(self, conn, batch):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            with db.write_lock():
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for job in batch:
+                        outcomes.append(self._run_job(conn, job))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                try:
+                    db.publish_data_version(conn)
+                except OSError:
+                    traceback.print_exc()
+        except Exception as exc:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(exc)
+            self._record(batch, started, failed_jobs=len(batch))
+            return
+        failed_jobs = sum(1 for _, _, error in outcomes if error is not None)
+        self._record(batch, started, failed_jobs=failed_jobs, committed=True)
+        for hook in self._commit_hooks:
+            try:
+                hook()
+            except Exception:
+                traceback.print_exc()
+        for job, result, error in outcomes:
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+
+    def _run_job(self, conn, job):
+        conn.execute("SAVEPOINT writer_job")
+        try:
+            with metrics.timed_query(f"writer.{job.fn.__name__}"):
+                result = job.fn(conn, *job.args, **job.kwargs)
+        except Exception as exc:
+            conn.execute("ROLLBACK TO writer_job")
+            conn.execute("RELEASE writer_job")
+            return job, None, exc
+        conn.execute("RELEASE writer_job")
+        return job, result, None
+
+    def _record(self, batch, started, failed_jobs=0, committed=False):
+        finished = time.perf_counter()
+        waits = [started - job.enqueued_at for job in batch]
+        with self._stats_lock:
+            stats = self._stats
+            stats["jobs"] += len(batch)
+            stats["batches"] += 1
+            stats["failed_jobs"] += failed_jobs
+            if not committed:
+                stats["failed_batches"] += 1
+            stats["max_batch_size"] = max(stats["max_batch_size"], len(batch))
+            stats["wait_seconds_total"] += sum(waits)
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], *waits)
+            stats["commit_seconds_total"] += finished - started
+
+
+_writer = DatabaseWriter()
+
+
+def submit(fn, *args, **kwargs):
+    return _writer.submit(fn, *args, **kwargs)
+
+
+def call(fn, *args, **kwargs):
+    return _writer.call(fn, *args, **kwargs)
+
+
+def drain(timeout=None):
+    return _writer.drain(timeout)
+
+
+def add_commit_hook(hook):
+    _writer.add_commit_hook(hook)
+
+
+def stats():
+    return _writer.stats()